@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from analytics.rollups import mark_all_stale, refresh_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the analytics rollups of journeys whose bookings or payments changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true',
+                            help="Rebuild every journey, e.g. after first deploying analytics")
+
+    def handle(self, *args, **options):
+        if options['all']:
+            self.stdout.write(f"Marked {mark_all_stale()} journeys stale")
+        refreshed = refresh_rollups(batch_size=options['batch_size'])
+        self.stdout.write(f"Refreshed rollups for {refreshed} journeys")
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('journey', '0009_booking_export_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleJourney',
+            fields=[
+                ('journey', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='journey.journey')),
+                ('marked_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Stale journeys',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('CONFIRMED', 'Confirmed'), ('CANCELLED', 'Cancelled'), ('PENDING', 'Pending')], max_length=10)),
+                ('departure_date', models.DateField()),
+                ('transport_type', models.CharField(choices=[('BUS', 'Bus'), ('TRAIN', 'Train'), ('PLANE', 'Plane'), ('SHIP', 'Ship')], max_length=5)),
+                ('bookings', models.PositiveIntegerField()),
+                ('seats', models.PositiveIntegerField()),
+                ('booked_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('paid_amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('destination_station', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='journey.station')),
+                ('journey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='journey.journey')),
+                ('source_station', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='journey.station')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'transport_type'], name='analytics_b_date_020f48_idx'), models.Index(fields=['date', 'source_station', 'destination_station'], name='analytics_b_date_850fcb_idx'), models.Index(fields=['departure_date', 'source_station', 'destination_station'], name='analytics_b_departu_371480_idx')],
+                'constraints': [models.UniqueConstraint(fields=('journey', 'date', 'status'), name='unique_booking_rollup')],
+            },
+        ),
+    ]
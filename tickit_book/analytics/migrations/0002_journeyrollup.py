@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 5000
+
+
+def mark_journeys_stale(apps, schema_editor):
+    # Load factors now read capacity from JourneyRollup; the next
+    # refresh_analytics run fills it for existing journeys.
+    Journey = apps.get_model('journey', 'Journey')
+    StaleJourney = apps.get_model('analytics', 'StaleJourney')
+    last_id = 0
+    while True:
+        journey_ids = list(
+            Journey.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not journey_ids:
+            return
+        StaleJourney.objects.bulk_create(
+            [StaleJourney(journey_id=pk) for pk in journey_ids], ignore_conflicts=True
+        )
+        last_id = journey_ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('journey', '0012_backfill_journey_seats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JourneyRollup',
+            fields=[
+                ('journey', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='journey.journey')),
+                ('departure_date', models.DateField()),
+                ('transport_type', models.CharField(choices=[('BUS', 'Bus'), ('TRAIN', 'Train'), ('PLANE', 'Plane'), ('SHIP', 'Ship')], max_length=5)),
+                ('capacity', models.PositiveIntegerField()),
+                ('confirmed_seats', models.PositiveIntegerField()),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('destination_station', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='journey.station')),
+                ('source_station', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='journey.station')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['departure_date', 'source_station', 'destination_station'], name='analytics_j_departu_2b1df4_idx')],
+            },
+        ),
+        migrations.RunPython(mark_journeys_stale, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+from django.db import models
+from journey.models import Booking, Journey, Station
+
+
+class BookingRollup(models.Model):
+    """Bookings of one journey made on one day, in one status.
+
+    Route, departure date and transport type are copied from the journey so
+    dashboard queries read this table alone. Rows are rebuilt per journey by
+    analytics.rollups.refresh_rollups and never edited in place.
+    """
+    journey = models.ForeignKey(Journey, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()  # booking date
+    status = models.CharField(max_length=10, choices=Booking.BookingStatus.choices)
+    source_station = models.ForeignKey(Station, on_delete=models.CASCADE, null=True, related_name='+')
+    destination_station = models.ForeignKey(Station, on_delete=models.CASCADE, null=True, related_name='+')
+    departure_date = models.DateField()
+    transport_type = models.CharField(max_length=5, choices=Journey.TransportType.choices)
+    bookings = models.PositiveIntegerField()
+    seats = models.PositiveIntegerField()
+    booked_value = models.DecimalField(max_digits=14, decimal_places=2)
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2)  # completed payments only
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['journey', 'date', 'status'], name='unique_booking_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'transport_type']),
+            models.Index(fields=['date', 'source_station', 'destination_station']),
+            models.Index(fields=['departure_date', 'source_station', 'destination_station']),
+        ]
+
+    def __str__(self):
+        return f"{self.journey_id} {self.date} {self.status}: {self.bookings}"
+
+
+class JourneyRollup(models.Model):
+    """Capacity and confirmed seats of one journey that has not been cancelled.
+
+    Rebuilt together with the journey's BookingRollup rows. A cancelled
+    journey has no row, so it drops out of load factors.
+    """
+    journey = models.OneToOneField(Journey, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    source_station = models.ForeignKey(Station, on_delete=models.CASCADE, null=True, related_name='+')
+    destination_station = models.ForeignKey(Station, on_delete=models.CASCADE, null=True, related_name='+')
+    departure_date = models.DateField()
+    transport_type = models.CharField(max_length=5, choices=Journey.TransportType.choices)
+    capacity = models.PositiveIntegerField()
+    confirmed_seats = models.PositiveIntegerField()
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['departure_date', 'source_station', 'destination_station']),
+        ]
+
+    def __str__(self):
+        return f"{self.journey_id}: {self.confirmed_seats}/{self.capacity}"
+
+
+class StaleJourney(models.Model):
+    """A journey whose rollup rows need rebuilding."""
+    journey = models.OneToOneField(Journey, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    marked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Stale journeys"
@@ -0,0 +1,122 @@
+from collections import Counter
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from journey.models import Booking, Journey, Payment
+from .models import BookingRollup, JourneyRollup, StaleJourney
+
+# Booking and payment writes only mark their journey stale, with one insert
+# in the writer's own transaction. refresh_rollups later rebuilds the rollup
+# rows of stale journeys from Booking and Payment, so the cost of a refresh
+# depends on the bookings of the journeys touched since the last run, never
+# on the size of the history.
+
+
+def mark_stale(journey_ids):
+    StaleJourney.objects.bulk_create(
+        [StaleJourney(journey_id=pk) for pk in set(journey_ids) if pk is not None],
+        ignore_conflicts=True
+    )
+
+
+def _route(journey):
+    # Copied from the journey onto both kinds of rollup row.
+    return {
+        'source_station_id': journey['source_station_id'],
+        'destination_station_id': journey['destination_station_id'],
+        'departure_date': journey['departure_date'],
+        'transport_type': journey['transport_type'],
+    }
+
+
+def _rebuild(journey_ids):
+    journeys = {
+        row['id']: row for row in Journey.objects.filter(pk__in=journey_ids)
+        .annotate(departure_date=TruncDate('departure_time'))
+        .values(
+            'id', 'source_station_id', 'destination_station_id', 'departure_date', 'transport_type',
+            'total_seats', 'cancelled_time',
+        )
+    }
+    totals = list(
+        Booking.objects.filter(journey_id__in=journeys)
+        .annotate(date=TruncDate('booking_time'))
+        .values('journey_id', 'date', 'status')
+        .annotate(
+            bookings=Count('id'),
+            seats=Sum('seat_count'),
+            booked_value=Sum('total_price'),
+            paid_amount=Coalesce(
+                Sum('payment__amount', filter=Q(payment__status=Payment.PaymentStatus.COMPLETED)),
+                Value(Decimal('0'))
+            ),
+        )
+        .order_by()
+    )
+    confirmed = Counter()
+    for row in totals:
+        if row['status'] == Booking.BookingStatus.CONFIRMED:
+            confirmed[row['journey_id']] += row['seats']
+
+    BookingRollup.objects.filter(journey_id__in=journey_ids).delete()
+    BookingRollup.objects.bulk_create([
+        BookingRollup(
+            journey_id=row['journey_id'],
+            date=row['date'],
+            status=row['status'],
+            **_route(journeys[row['journey_id']]),
+            bookings=row['bookings'],
+            seats=row['seats'],
+            booked_value=row['booked_value'],
+            paid_amount=row['paid_amount'],
+        )
+        for row in totals
+    ])
+    JourneyRollup.objects.filter(journey_id__in=journey_ids).delete()
+    JourneyRollup.objects.bulk_create([
+        JourneyRollup(
+            journey_id=pk,
+            **_route(journey),
+            capacity=journey['total_seats'],
+            confirmed_seats=confirmed[pk],
+        )
+        for pk, journey in journeys.items() if journey['cancelled_time'] is None
+    ])
+
+
+def refresh_rollups(batch_size=500):
+    """Rebuild the rollups of stale journeys; returns how many were refreshed.
+
+    Each batch claims its marks with skip_locked, so several refreshers can
+    run at once. A journey written to while its batch is in flight is marked
+    again and picked up by the next run.
+    """
+    refreshed = 0
+    while True:
+        with transaction.atomic():
+            journey_ids = list(
+                StaleJourney.objects.select_for_update(skip_locked=True)
+                .order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not journey_ids:
+                return refreshed
+            StaleJourney.objects.filter(pk__in=journey_ids).delete()
+            _rebuild(journey_ids)
+        refreshed += len(journey_ids)
+
+
+def mark_all_stale(batch_size=5000):
+    """Mark every journey stale, e.g. to backfill the rollups."""
+    last_id = 0
+    marked = 0
+    while True:
+        journey_ids = list(
+            Journey.objects.filter(pk__gt=last_id)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not journey_ids:
+            return marked
+        mark_stale(journey_ids)
+        marked += len(journey_ids)
+        last_id = journey_ids[-1]
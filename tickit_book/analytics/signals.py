@@ -0,0 +1,32 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from journey.models import Booking, Journey, Payment
+from journey.signals import bookings_changed, journeys_imported
+from .rollups import mark_stale
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, **kwargs):
+    mark_stale([instance.journey_id])
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, **kwargs):
+    mark_stale([instance.booking.journey_id])
+
+
+@receiver(post_save, sender=Journey)
+def journey_saved(sender, instance, **kwargs):
+    # Capacity, route, departure, transport type and cancellation are
+    # copied onto the rollups; a new journey counts towards capacity.
+    mark_stale([instance.pk])
+
+
+@receiver(journeys_imported)
+def journeys_created(sender, journey_ids, **kwargs):
+    mark_stale(journey_ids)
+
+
+@receiver(bookings_changed)
+def bookings_updated(sender, journey_ids, **kwargs):
+    mark_stale(journey_ids)
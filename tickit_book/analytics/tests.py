@@ -0,0 +1,97 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from authentication.tokens import tokens_for_user
+from journey.models import Booking, Journey, Payment
+from journey.services import book_journey, cancel_booking, cancel_journey_bookings
+from journey.tests import make_journey, make_user
+from .models import BookingRollup, JourneyRollup, StaleJourney
+from .rollups import refresh_rollups
+
+
+class RollupRefreshTests(TestCase):
+
+    def test_refresh_rebuilds_only_stale_journeys(self):
+        journey = make_journey(seats=10)
+        user = make_user()
+        booking = book_journey(user.pk, journey, 3)
+        cancel_booking(book_journey(user.pk, journey, 2))
+        Payment.objects.create(
+            booking=booking, amount=booking.total_price, payment_method='Card',
+            transaction_id='txn-1', status=Payment.PaymentStatus.COMPLETED,
+        )
+
+        self.assertTrue(StaleJourney.objects.filter(journey=journey).exists())
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertFalse(StaleJourney.objects.exists())
+        self.assertEqual(refresh_rollups(), 0)
+
+        rollups = {row.status: row for row in BookingRollup.objects.filter(journey=journey)}
+        self.assertEqual(rollups[Booking.BookingStatus.CONFIRMED].seats, 3)
+        self.assertEqual(rollups[Booking.BookingStatus.CONFIRMED].paid_amount, Decimal('30'))
+        self.assertEqual(rollups[Booking.BookingStatus.CANCELLED].seats, 2)
+        journey_rollup = JourneyRollup.objects.get(journey=journey)
+        self.assertEqual((journey_rollup.capacity, journey_rollup.confirmed_seats), (10, 3))
+
+    def test_cancelled_journey_loses_its_capacity(self):
+        journey = make_journey(seats=10)
+        book_journey(make_user().pk, journey, 3)
+        refresh_rollups()
+
+        cancel_journey_bookings(journey.pk)
+        refresh_rollups()
+
+        self.assertFalse(JourneyRollup.objects.filter(journey=journey).exists())
+        self.assertEqual(
+            BookingRollup.objects.get(journey=journey).status, Booking.BookingStatus.CANCELLED
+        )
+
+
+class DashboardTests(TestCase):
+
+    def setUp(self):
+        admin = get_user_model().objects.create_user(
+            username='ops', email='ops@example.com', password=None, is_staff=True
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(admin).access_token}')
+        user = make_user()
+        self.full = make_journey(seats=10)
+        self.empty = make_journey(seats=30)
+        self.cancelled = make_journey(seats=50)
+        book_journey(user.pk, self.full, 4)
+        cancel_booking(book_journey(user.pk, self.full, 1))
+        book_journey(user.pk, self.cancelled, 5)
+        cancel_journey_bookings(self.cancelled.pk)
+        refresh_rollups()
+        self.departure_date = JourneyRollup.objects.get(journey=self.full).departure_date
+
+    def get(self, name):
+        response = self.client.get(reverse(name), {'end': self.departure_date})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_load_factor_counts_live_journeys_from_the_rollup(self):
+        with self.assertNumQueries(2):  # the rollup and the station names
+            [route] = self.get('analytics-load-factor')
+        self.assertEqual(route['journeys'], 2)
+        self.assertEqual(route['capacity'], 40)
+        self.assertEqual(route['confirmed_seats'], 4)
+        self.assertEqual(route['load_factor'], 0.1)
+
+    def test_revenue_leaves_out_cancelled_bookings(self):
+        [row] = self.get('analytics-revenue')
+        self.assertEqual(row['transport_type'], Journey.TransportType.BUS)
+        self.assertEqual(row['bookings'], 1)
+        self.assertEqual(row['seats'], 4)
+        self.assertEqual(row['booked_value'], Decimal('40'))
+
+    def test_cancellation_rate_per_route(self):
+        [route] = self.get('analytics-cancellations')
+        self.assertEqual((route['bookings'], route['cancelled']), (3, 2))
+
+    def test_dashboards_are_staff_only(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(make_user("guest")).access_token}')
+        self.assertEqual(self.client.get(reverse('analytics-revenue')).status_code, 403)
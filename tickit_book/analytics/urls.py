@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import CancellationRateView, LoadFactorView, RevenueView
+
+urlpatterns = [
+    path('load-factor/', LoadFactorView.as_view(), name='analytics-load-factor'),
+    path('revenue/', RevenueView.as_view(), name='analytics-revenue'),
+    path('cancellations/', CancellationRateView.as_view(), name='analytics-cancellations'),
+]
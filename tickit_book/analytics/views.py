@@ -0,0 +1,115 @@
+from datetime import timedelta
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from journey.models import Booking, Station
+from .models import BookingRollup, JourneyRollup
+
+MAX_RANGE_DAYS = 366
+
+
+class RollupView(APIView):
+    """Base for dashboard endpoints; ?start= and ?end= are inclusive dates."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        end = parse_date(request.query_params.get('end', '')) or timezone.localdate()
+        start = parse_date(request.query_params.get('start', '')) or end - timedelta(days=29)
+        if start > end or (end - start).days >= MAX_RANGE_DAYS:
+            return Response(
+                {'detail': f'start must be on or before end and at most {MAX_RANGE_DAYS} days earlier'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'start': start, 'end': end, 'results': self.results(start, end)})
+
+    def results(self, start, end):
+        raise NotImplementedError
+
+
+def _station_names(rows):
+    ids = {row['source_station'] for row in rows} | {row['destination_station'] for row in rows}
+    return dict(Station.objects.filter(pk__in=ids).values_list('id', 'name'))
+
+
+def _ratio(part, whole):
+    return round(part / whole, 4) if whole else None
+
+
+class LoadFactorView(RollupView):
+    """Confirmed seats over capacity per route and departure date.
+
+    Cancelled journeys are left out of both.
+    """
+
+    def results(self, start, end):
+        rows = list(
+            JourneyRollup.objects.filter(departure_date__range=(start, end))
+            .values('source_station', 'destination_station', 'departure_date')
+            .annotate(journeys=Count('pk'), capacity=Sum('capacity'), confirmed_seats=Sum('confirmed_seats'))
+            .order_by()
+        )
+        names = _station_names(rows)
+        results = [
+            {
+                'source': names.get(row['source_station']),
+                'destination': names.get(row['destination_station']),
+                'departure_date': row['departure_date'],
+                'journeys': row['journeys'],
+                'capacity': row['capacity'],
+                'confirmed_seats': row['confirmed_seats'],
+                'load_factor': _ratio(row['confirmed_seats'], row['capacity']),
+            }
+            for row in rows
+        ]
+        results.sort(key=lambda row: (row['departure_date'], row['source'] or '', row['destination'] or ''))
+        return results
+
+
+class RevenueView(RollupView):
+    """Booked value and completed payments per transport type, by booking date."""
+
+    def results(self, start, end):
+        live = ~Q(status=Booking.BookingStatus.CANCELLED)
+        return list(
+            BookingRollup.objects.filter(date__range=(start, end))
+            .values('transport_type')
+            .annotate(
+                bookings=Sum('bookings', filter=live),
+                seats=Sum('seats', filter=live),
+                booked_value=Sum('booked_value', filter=live),
+                paid_amount=Sum('paid_amount'),
+            )
+            .order_by('transport_type')
+        )
+
+
+class CancellationRateView(RollupView):
+    """Share of bookings cancelled per route, by booking date."""
+
+    def results(self, start, end):
+        rows = list(
+            BookingRollup.objects.filter(date__range=(start, end))
+            .values('source_station', 'destination_station')
+            .annotate(
+                # cancelled first: once annotated, 'bookings' names the aggregate.
+                cancelled=Sum('bookings', filter=Q(status=Booking.BookingStatus.CANCELLED)),
+                bookings=Sum('bookings'),
+            )
+            .order_by()
+        )
+        names = _station_names(rows)
+        results = [
+            {
+                'source': names.get(row['source_station']),
+                'destination': names.get(row['destination_station']),
+                'bookings': row['bookings'],
+                'cancelled': row['cancelled'] or 0,
+                'cancellation_rate': _ratio(row['cancelled'] or 0, row['bookings']),
+            }
+            for row in rows
+        ]
+        results.sort(key=lambda row: (row['source'] or '', row['destination'] or ''))
+        return results
@@ -0,0 +1,26 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+
+
+def _profile_key(username):
+    # Usernames may hold characters memcached does not accept in keys.
+    return f'user-profile:{hashlib.md5(username.encode()).hexdigest()}'
+
+
+def get_profile_data(username, serializer_class):
+    """Serialized profile for username, or None; looked up on its unique index."""
+    key = _profile_key(username)
+    data = cache.get(key)
+    if data is None:
+        user = get_user_model().objects.filter(username=username).first()
+        if user is None:
+            return None
+        data = dict(serializer_class(user).data)
+        cache.set(key, data, settings.PROFILE_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_profile(username):
+    cache.delete(_profile_key(username))
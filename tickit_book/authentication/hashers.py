@@ -0,0 +1,31 @@
+"""
+Password hashers whose cost comes from settings.
+
+Django rehashes a password on the next successful login whenever the
+stored hash was made by another hasher or with different parameters, so
+changing PASSWORD_ARGON2 or PASSWORD_PBKDF2_ITERATIONS (or installing
+argon2-cffi) migrates users over transparently as they log in.
+"""
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2['TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2['MEMORY_COST']  # KiB
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2['PARALLELISM']
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from tickit_book.bulk_import import RowError, import_rows
+
+REQUIRED_FIELDS = ('username', 'email')
+OPTIONAL_TEXT_FIELDS = ('first_name', 'last_name', 'phone_number')
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 't')
+
+username_validator = UnicodeUsernameValidator()
+
+
+def _parse_text(value, field):
+    # Checked per row: an oversize value would otherwise fail the insert
+    # and roll back the whole batch.
+    if not isinstance(value, str):
+        raise RowError(f"{field}: expected text, got {value!r}")
+    value = value.strip()
+    max_length = get_user_model()._meta.get_field(field).max_length
+    if len(value) > max_length:
+        raise RowError(f"{field}: longer than {max_length} characters")
+    return value
+
+
+def _parse_password(value):
+    # Passwords arrive already hashed in Django's "<algorithm>$..." format;
+    # importing never hashes. A hash from a hasher we still accept but no
+    # longer prefer is upgraded on the user's first login.
+    if not value:
+        return make_password(None)  # unusable: the user has to reset it
+    try:
+        identify_hasher(value)
+    except ValueError:
+        raise RowError("password: not a hash from a configured PASSWORD_HASHERS entry")
+    return value
+
+
+def parse_row(row):
+    """Return an unsaved user for a raw row or raise RowError."""
+    if not isinstance(row, dict):
+        raise RowError(f"invalid JSON: {row}")
+    missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+    if missing:
+        raise RowError(f"missing fields: {', '.join(missing)}")
+
+    User = get_user_model()
+    username = _parse_text(row['username'], 'username')
+    email = User.objects.normalize_email(_parse_text(row['email'], 'email'))
+    optional = {
+        field: _parse_text(row[field], field)
+        for field in OPTIONAL_TEXT_FIELDS if row.get(field) not in (None, '')
+    }
+    try:
+        username_validator(username)
+        validate_email(email)
+    except ValidationError as exc:
+        raise RowError(' '.join(exc.messages))
+
+    is_active = row.get('is_active')
+    return User(
+        username=username,
+        email=email,
+        password=_parse_password(row.get('password')),
+        first_name=optional.get('first_name') or '',
+        last_name=optional.get('last_name') or '',
+        phone_number=optional.get('phone_number') or None,
+        is_active=True if is_active in (None, '') else str(is_active).strip().lower() in TRUE_VALUES,
+    )
+
+
+def _drop_duplicates(parsed):
+    """Split (line, user) pairs into new users and error reports for clashes.
+
+    Existing accounts are found with one query per unique column, each an
+    index lookup.
+    """
+    User = get_user_model()
+    taken_usernames = set(User.objects.filter(
+        username__in=[user.username for _, user in parsed]
+    ).values_list('username', flat=True))
+    taken_emails = set(User.objects.filter(
+        email__in=[user.email for _, user in parsed]
+    ).values_list('email', flat=True))
+
+    new, errors = [], []
+    for line_number, user in parsed:
+        if user.username in taken_usernames:
+            errors.append({'line': line_number, 'error': 'username already exists'})
+        elif user.email in taken_emails:
+            errors.append({'line': line_number, 'error': 'email already exists'})
+        else:
+            # Also catches duplicates within the batch itself.
+            taken_usernames.add(user.username)
+            taken_emails.add(user.email)
+            new.append(user)
+    return new, errors
+
+
+def import_batch(users):
+    with transaction.atomic():
+        get_user_model().objects.bulk_create(users)
+    return len(users)
+
+
+def _insert(parsed):
+    users, clashes = _drop_duplicates(parsed)
+    return (import_batch(users) if users else 0), clashes
+
+
+def import_users(rows, batch_size=1000):
+    """Validate and insert user rows batch by batch; see import_rows().
+
+    Rows whose username or email is already taken are reported and skipped.
+    """
+    return import_rows(rows, parse_row, _insert, batch_size)
@@ -0,0 +1,94 @@
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from journey.benchmark import client_settings
+
+# Large enough that nothing is throttled while measuring unthrottled attempts.
+NO_THROTTLE = {scope: (10 ** 9, 10 ** 9) for scope in ('login_ip', 'login_account', 'password_change')}
+
+
+class Command(BaseCommand):
+    help = "Measure CPU time per password hash and per login attempt, with and without throttling"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=50)
+        parser.add_argument('--pbkdf2-iterations', type=int)
+        parser.add_argument('--argon2-time-cost', type=int)
+        parser.add_argument('--argon2-memory-cost', type=int, help="KiB")
+
+    def handle(self, *args, **options):
+        overrides = {}
+        if options['pbkdf2_iterations']:
+            overrides['PASSWORD_PBKDF2_ITERATIONS'] = options['pbkdf2_iterations']
+        if options['argon2_time_cost'] or options['argon2_memory_cost']:
+            overrides['PASSWORD_ARGON2'] = {
+                **settings.PASSWORD_ARGON2,
+                'TIME_COST': options['argon2_time_cost'] or settings.PASSWORD_ARGON2['TIME_COST'],
+                'MEMORY_COST': options['argon2_memory_cost'] or settings.PASSWORD_ARGON2['MEMORY_COST'],
+            }
+
+        attempts = options['attempts']
+        with client_settings(**overrides):
+            hasher = get_hasher()
+            self.stdout.write(f"hasher: {hasher.algorithm}")
+            cpu = self._cpu(lambda: hasher.encode('bench-password', hasher.salt()), attempts)
+            self._report('hash', cpu)
+
+            # A throwaway account; the suffix keeps its throttle buckets fresh.
+            suffix = uuid.uuid4().hex[:12]
+            email = f'bench-login-{suffix}@example.com'
+            User = get_user_model()
+            [user] = User.objects.bulk_create([
+                User(username=f'bench-login-{suffix}', email=email, password=make_password('bench-password'))
+            ])
+            try:
+                with override_settings(LOGIN_THROTTLES=NO_THROTTLE):
+                    self._report('login ok', self._login(email, 'bench-password', attempts, suffix)[200])
+                    self._report('login bad password',
+                                 self._login(email, 'wrong-password', attempts, suffix)[401])
+
+                # One client hammering one account with the configured buckets.
+                by_status = self._login(email, 'wrong-password', attempts, suffix + '-attack')
+                for status, label in ((401, 'attack, hashed'), (429, 'attack, throttled')):
+                    if by_status[status]:
+                        self._report(label, by_status[status])
+            finally:
+                user.delete()
+
+    def _cpu(self, call, count):
+        samples = []
+        for _ in range(count):
+            started = time.process_time()
+            call()
+            samples.append(time.process_time() - started)
+        return samples
+
+    def _login(self, email, password, count, ip_seed):
+        client = APIClient()
+        path = reverse('user-login')
+        # A documentation address (RFC 5737) per run, so earlier runs' buckets don't count.
+        ip = f'203.0.113.{sum(ip_seed.encode()) % 254 + 1}'
+        by_status = defaultdict(list)
+        for _ in range(count):
+            started = time.process_time()
+            response = client.post(path, {'username': email, 'password': password},
+                                   format='json', REMOTE_ADDR=ip)
+            by_status[response.status_code].append(time.process_time() - started)
+        return by_status
+
+    def _report(self, label, samples):
+        if not samples:
+            self.stderr.write(f"{label:>20}: no attempts got the expected response")
+            return
+        self.stdout.write(
+            f"{label:>20}: {len(samples)} x, CPU mean {statistics.fmean(samples) * 1000:.2f}ms, "
+            f"p50 {statistics.median(samples) * 1000:.2f}ms"
+        )
@@ -0,0 +1,13 @@
+from authentication.importer import import_users
+from tickit_book.bulk_import import ImportCommand
+
+
+class Command(ImportCommand):
+    help = (
+        "Bulk import users from a CSV or JSON-lines file. Passwords must already be "
+        "hashed in Django's format; rows without one get an unusable password"
+    )
+    noun = 'users'
+
+    def run_import(self, rows, batch_size):
+        return import_users(rows, batch_size)
@@ -0,0 +1,152 @@
+"""
+Move existing users from auth_user to authentication_userprofile.
+
+Until AUTH_USER_MODEL was set, UserProfile was swapped out: 0001 was
+recorded as applied without creating its table, users lived in auth_user
+and every foreign key to "the user" (bookings, the admin log) points there.
+On such a database this migration
+
+  1. creates the authentication_userprofile tables,
+  2. copies every auth_user row into it with the same primary key, along
+     with its group and permission memberships,
+  3. repoints every foreign key that referenced auth_user at the new table.
+
+auth_user and its membership tables are left in place, unreferenced, so
+they can be checked and dropped by hand afterwards.
+
+UserProfile.email is unique and is the login field. A user whose email is
+blank, or repeats an earlier user's, is given user-<id>@users.invalid and
+has to be given a real address before they can log in; the migration
+prints how many users that affected.
+
+On a new database (or one that never had auth_user) it does nothing.
+Repointing foreign keys is only implemented for PostgreSQL; a development
+SQLite database with users in auth_user has to be recreated.
+"""
+
+from django.core.management.color import no_style
+from django.db import migrations
+
+OLD_TABLE = 'auth_user'
+COLUMNS = (
+    'id', 'password', 'last_login', 'is_superuser', 'username', 'first_name',
+    'last_name', 'email', 'is_staff', 'is_active', 'date_joined',
+)
+
+
+def _foreign_keys_to(cursor, connection, table):
+    """(table, column, constraint) for every foreign key referencing table.id."""
+    found = []
+    introspection = connection.introspection
+    for other in introspection.table_names(cursor):
+        for name, info in introspection.get_constraints(cursor, other).items():
+            if info['foreign_key'] == (table, 'id'):
+                found.append((other, info['columns'][0], name))
+    return found
+
+
+def _copy_users(cursor, new_table, qn):
+    # Raw SQL rather than bulk_create(), which would overwrite date_joined
+    # (auto_now_add) with the time of the migration.
+    email = COLUMNS.index('email')
+    taken = set()
+    placeholders = 0
+    rows = []
+    cursor.execute(f"SELECT {', '.join(map(qn, COLUMNS))} FROM {qn(OLD_TABLE)} ORDER BY {qn('id')}")
+    for row in cursor.fetchall():
+        row = list(row)
+        if not row[email] or row[email] in taken:
+            row[email] = f"user-{row[0]}@users.invalid"
+            placeholders += 1
+        taken.add(row[email])
+        rows.append(row)
+
+    cursor.executemany(
+        f"INSERT INTO {qn(new_table)} ({', '.join(map(qn, COLUMNS))}) "
+        f"VALUES ({', '.join(['%s'] * len(COLUMNS))})",
+        rows
+    )
+    return len(rows), placeholders
+
+
+def _copy_memberships(cursor, UserProfile, qn):
+    for field_name, old_table, target in (
+        ('groups', 'auth_user_groups', 'group_id'),
+        ('user_permissions', 'auth_user_user_permissions', 'permission_id'),
+    ):
+        through = UserProfile._meta.get_field(field_name).remote_field.through._meta
+        cursor.execute(
+            f"INSERT INTO {qn(through.db_table)} ({qn('userprofile_id')}, {qn(target)}) "
+            f"SELECT {qn('user_id')}, {qn(target)} FROM {qn(old_table)}"
+        )
+
+
+def _repoint(schema_editor, cursor, new_table):
+    qn = schema_editor.quote_name
+    foreign_keys = [
+        (table, column, name)
+        for table, column, name in _foreign_keys_to(cursor, schema_editor.connection, OLD_TABLE)
+        if table not in ('auth_user_groups', 'auth_user_user_permissions')
+    ]
+    if foreign_keys and schema_editor.connection.vendor != 'postgresql':
+        raise RuntimeError(
+            "Moving users out of auth_user is only supported on PostgreSQL; "
+            "recreate this development database instead."
+        )
+    for table, column, name in foreign_keys:
+        new_name = schema_editor._create_index_name(table, [column], suffix=f'_fk_{new_table}_id')
+        cursor.execute(f"ALTER TABLE {qn(table)} DROP CONSTRAINT {qn(name)}")
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(new_name)} FOREIGN KEY ({qn(column)}) "
+            f"REFERENCES {qn(new_table)} ({qn('id')}) DEFERRABLE INITIALLY DEFERRED"
+        )
+    return len(foreign_keys)
+
+
+def adopt_userprofile(apps, schema_editor):
+    UserProfile = apps.get_model('authentication', 'UserProfile')
+    new_table = UserProfile._meta.db_table
+    connection = schema_editor.connection
+    qn = schema_editor.quote_name
+
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+        if OLD_TABLE not in tables:
+            return
+        if new_table not in tables:
+            schema_editor.create_model(UserProfile)
+        elif UserProfile.objects.exists():
+            raise RuntimeError(
+                f"Both {OLD_TABLE} and {new_table} hold users; their primary keys may "
+                f"clash. Merge them by hand before migrating."
+            )
+
+        copied, placeholders = _copy_users(cursor, new_table, qn)
+        _copy_memberships(cursor, UserProfile, qn)
+        for sql in connection.ops.sequence_reset_sql(no_style(), [UserProfile]):
+            cursor.execute(sql)
+        repointed = _repoint(schema_editor, cursor, new_table)
+
+    print(
+        f"\n  Moved {copied} users from {OLD_TABLE} ({placeholders} given a placeholder email), "
+        f"repointed {repointed} foreign keys"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    # Everything added since users lived in auth_user must find the new
+    # table already there.
+    run_before = [
+        ('journey', '0002_booking_hold_expiry'),
+        ('token_blacklist', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(adopt_userprofile, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from django.contrib.auth import get_user_model  # Import get_user_model
 
 
 class UserProfile(AbstractUser):
@@ -20,20 +17,27 @@ class UserProfile(AbstractUser):
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        if {'is_active', 'is_staff', 'is_superuser'} <= set(field_names):
+            user._saved_privileges = (user.is_active, user.is_staff, user.is_superuser)
+        return user
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Tokens carry is_staff and is_superuser as claims and authenticate
+        # without reading the user row, so deactivating the user or taking
+        # either privilege away must also void the tokens issued before. A
+        # new privilege only needs the next token refresh.
+        saved = getattr(self, '_saved_privileges', None)
+        privileges = (self.is_active, self.is_staff, self.is_superuser)
+        if saved is not None and any(was and not now for was, now in zip(saved, privileges)):
+            from .tokens import revoke_user_tokens
+            transaction.on_commit(lambda: revoke_user_tokens(self.pk))
+        self._saved_privileges = privileges
+
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
         swappable = 'AUTH_USER_MODEL'
-
-
-
-@receiver(post_save, sender=get_user_model())  # Use get_user_model() here
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        UserProfile.objects.create(user=instance)
-
-
-
-@receiver(post_save, sender=get_user_model()) # Use get_user_model() here
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
@@ -3,10 +3,13 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from rest_framework.validators import UniqueValidator
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
+from tickit_book.metrics import TimedSerializerMixin
 
 User = get_user_model()  # Use get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, validators=[validate_password])
     email = serializers.EmailField(
         required=True,
@@ -19,16 +22,15 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ('is_staff', 'is_superuser', 'date_joined') #these should not be set during sign up or update
 
     def create(self, validated_data):
-        user = User.objects.create_user( #changed from create_user
+        # create_user() hashes the password as part of its single INSERT.
+        return User.objects.create_user(
             username=validated_data['username'],
             email=validated_data['email'],
+            password=validated_data['password'],
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', ''),
             phone_number=validated_data.get('phone_number', '') #added phone number
         )
-        user.set_password(validated_data['password'])
-        user.save()
-        return user
 
     def update(self, instance, validated_data):
         instance.email = validated_data.get('email', instance.email)
@@ -42,6 +44,34 @@ class UserSerializer(serializers.ModelSerializer):
         return instance
 
 
+class RegistrationSerializer(UserSerializer):
+    """UserSerializer without the uniqueness SELECTs: the unique indexes on
+    username and email reject duplicates, and only then is the clash looked up.
+    """
+    email = serializers.EmailField(required=True)
+
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            errors = {}
+            if User.objects.filter(username=validated_data['username']).exists():
+                errors['username'] = ['A user with that username already exists.']
+            if User.objects.filter(email=validated_data['email']).exists():
+                errors['email'] = ['This field must be unique.']
+            if not errors:
+                raise
+            raise serializers.ValidationError(errors)
+
+
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField()
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
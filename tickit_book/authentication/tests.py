@@ -1,3 +1,159 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .importer import RowError, parse_row
+from .throttles import TokenBucketThrottle
+from .tokens import is_revoked, tokens_for_user
 
-# Create your tests here.
+
+class ImportRowTests(SimpleTestCase):
+    row = {'username': 'traveller', 'email': 'traveller@example.com', 'phone_number': '+31 20 1234567'}
+
+    def test_valid_row(self):
+        user = parse_row({**self.row, 'first_name': ' Ada '})
+        self.assertEqual(user.first_name, 'Ada')
+        self.assertEqual(user.phone_number, '+31 20 1234567')
+        self.assertFalse(user.has_usable_password())
+
+    def test_invalid_rows_raise_row_error(self):
+        for change in (
+            {'username': 12345},
+            {'email': ['traveller@example.com']},
+            {'first_name': {'given': 'Ada'}},
+            {'last_name': 'x' * 151},
+            {'phone_number': '+31 20 1234567 ext. 9'},
+        ):
+            with self.subTest(**change), self.assertRaises(RowError):
+                parse_row({**self.row, **change})
+
+
+class TokenClaimTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='staffer', email='staffer@example.com', password=None, is_staff=True
+        )
+        self.refresh = tokens_for_user(self.user)
+        # Revocation has whole-second resolution; these tokens predate it.
+        self.refresh.set_iat(at_time=timezone.now() - timedelta(seconds=5))
+
+    def refreshed_claims(self):
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return AccessToken(response.data['access'])
+
+    def test_refresh_restamps_claims_from_the_user_row(self):
+        self.user.email = 'renamed@example.com'
+        self.user.is_superuser = True
+        self.user.save()
+        access = self.refreshed_claims()
+        self.assertEqual(access['email'], 'renamed@example.com')
+        self.assertTrue(access['is_superuser'])
+        self.assertFalse(is_revoked(self.refresh))
+
+    def test_removing_staff_revokes_tokens(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.is_staff = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertTrue(is_revoked(self.refresh))
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivating_the_user_revokes_tokens(self):
+        access = self.refresh.access_token
+        access.set_iat(at_time=timezone.now() - timedelta(seconds=5))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(client.get(reverse('user-profile')).status_code, 200)
+
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(client.get(reverse('user-profile')).status_code, 401)
+        self.assertTrue(is_revoked(self.refresh))
+
+
+class LogoutTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='leaver', email='leaver@example.com', password=None)
+        self.refresh = tokens_for_user(self.user)
+
+    def logout(self, access):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client.post(reverse('user-logout'), {'refresh': str(self.refresh)}, format='json')
+
+    def test_logout_revokes_both_tokens(self):
+        access = self.refresh.access_token
+        self.assertEqual(self.logout(access).status_code, 200)
+        self.assertTrue(is_revoked(access))
+
+    def test_logout_works_with_an_expired_access_token(self):
+        access = self.refresh.access_token
+        access.set_exp(lifetime=-timedelta(seconds=1))
+        self.assertEqual(self.logout(access).status_code, 200)
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+class FixedThrottle(TokenBucketThrottle):
+    scope = 'test'
+
+    def get_ident_key(self, request, view):
+        return 'client'
+
+
+@override_settings(LOGIN_THROTTLES={'test': (5, 1)})
+class TokenBucketThrottleTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def attempt(self, _=None):
+        return FixedThrottle().allow_request(None, None)
+
+    def test_concurrent_attempts_never_exceed_the_bucket(self):
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            allowed = sum(pool.map(self.attempt, range(50)))
+        self.assertEqual(allowed, 5)
+
+    def test_bucket_refills_at_the_configured_rate(self):
+        # Five tokens refilling at one a minute: a full window is five minutes.
+        with mock.patch('authentication.throttles.time.time', return_value=3000.0):
+            self.assertEqual(sum(self.attempt() for _ in range(6)), 5)
+            throttle = FixedThrottle()
+            self.assertFalse(throttle.allow_request(None, None))
+            self.assertAlmostEqual(throttle.wait(), 300)
+        # Halfway into the next window half of the old attempts still count.
+        with mock.patch('authentication.throttles.time.time', return_value=3450.0):
+            self.assertEqual(sum(self.attempt() for _ in range(5)), 2)
+
+
+@override_settings(LOGIN_THROTTLES={'login_ip': (3, 1), 'login_account': (100, 100)})
+class LoginIPThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_forwarded_for_header_does_not_pick_the_bucket(self):
+        client = APIClient(REMOTE_ADDR='203.0.113.7')
+        statuses = [
+            client.post(
+                reverse('user-login'), {'username': f'guess{attempt}', 'password': 'x'},
+                format='json', HTTP_X_FORWARDED_FOR=f'198.51.100.{attempt}'
+            ).status_code
+            for attempt in range(5)
+        ]
+        self.assertEqual(statuses, [401, 401, 401, 429, 429])
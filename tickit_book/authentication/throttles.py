@@ -0,0 +1,95 @@
+"""
+Token-bucket throttles for the endpoints that hash passwords.
+
+Each scope behaves like a bucket of `size` tokens that refills at a steady
+rate: a client can burst a few attempts and is then held to the refill
+rate. DRF checks throttles before the view runs, so a rejected attempt
+never reaches authenticate() or the password hasher: a credential-stuffing
+burst costs a few cache round trips per request instead of a full hash,
+and workers stay free for booking traffic.
+
+The bucket is kept as a sliding window counter so that it only needs the
+cache's atomic operations: attempts are counted per window of size / rate
+seconds with add() and incr(), and the previous window's count is weighted
+by how much of it still overlaps the last `window` seconds. Concurrent
+attempts on different workers can therefore never both take the last
+token. Counters live in the default cache so every worker shares them.
+Sizes and rates are set per scope in settings.LOGIN_THROTTLES.
+"""
+
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def get_ident_key(self, request, view):
+        """Return what the bucket is keyed on, or None to skip throttling."""
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        capacity, per_minute = settings.LOGIN_THROTTLES[self.scope]
+        window = capacity * 60 / per_minute  # seconds to refill an empty bucket
+        now = time.time()
+        index, elapsed = divmod(now, window)
+        key = f'throttle:{self.scope}:{ident}:{int(index)}'
+        timeout = int(window * 2) + 1  # the next window still reads this one
+
+        cache.add(key, 0, timeout)
+        try:
+            count = cache.incr(key)
+        except ValueError:  # evicted between add() and incr()
+            cache.set(key, 1, timeout)
+            count = 1
+        previous = cache.get(f'throttle:{self.scope}:{ident}:{int(index) - 1}', 0)
+        overlap = 1 - elapsed / window
+
+        if previous * overlap + count <= capacity:
+            return True
+        # Rejected attempts do not use up a token.
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+        count -= 1
+        if count + 1 > capacity or not previous:
+            self.retry_after = window - elapsed
+        else:
+            # Wait until enough of the previous window has slid out.
+            self.retry_after = (overlap - (capacity - count - 1) / previous) * window
+        return False
+
+    def wait(self):
+        return getattr(self, 'retry_after', None)
+
+
+class LoginIPThrottle(TokenBucketThrottle):
+    scope = 'login_ip'
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+
+class LoginAccountThrottle(TokenBucketThrottle):
+    """Keyed on the submitted username, whether or not the account exists."""
+    scope = 'login_account'
+
+    def get_ident_key(self, request, view):
+        username = request.data.get('username')
+        if not isinstance(username, str) or not username:
+            return None
+        return hashlib.sha256(username.strip().lower().encode()).hexdigest()
+
+
+class PasswordChangeThrottle(TokenBucketThrottle):
+    scope = 'password_change'
+
+    def get_ident_key(self, request, view):
+        return request.user.id if request.user.is_authenticated else None
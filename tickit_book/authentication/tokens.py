@@ -0,0 +1,190 @@
+"""
+Stateless JWT authentication.
+
+StatelessJWTAuthentication builds request.user from the signed claims of the
+access token (id, email, username, is_staff, is_superuser) instead of
+loading the user row on every request, so views that only need
+request.user.id cost no authentication queries at all.
+
+Code that needs the full UserProfile reads ClaimsUser.profile, which goes
+through a small per-process LRU cache with a TTL. Tokens are issued with
+tokens_for_user() so they carry the claims, and can be revoked before they
+expire with revoke_token() or, for every token of a user, with
+revoke_user_tokens(); both are looked up in the shared cache with a single
+get_many() per request, and on refresh.
+
+Refreshing re-reads the user row and stamps its current claims on the new
+access token, so a changed email or a new staff flag shows up within one
+access token lifetime. Taking is_staff or is_superuser away revokes the
+user's tokens straight away (see UserProfile.save).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
+
+
+class LoginRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        # Skip BlacklistMixin.for_user, which inserts an OutstandingToken row
+        # on every login. blacklist() creates that row itself, so only tokens
+        # that are actually logged out ever reach the table.
+        return super(BlacklistMixin, cls).for_user(user)
+
+
+def _stamp_claims(token, user):
+    # Claims on the refresh token are copied into every access token it mints.
+    token['email'] = user.email
+    token['username'] = user.username
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+
+
+def tokens_for_user(user):
+    """Return a RefreshToken whose access token carries the user's claims."""
+    refresh = LoginRefreshToken.for_user(user)
+    _stamp_claims(refresh, user)
+    return refresh
+
+
+# Revocation
+
+def _token_key(jti):
+    return f'jwt-revoked:{jti}'
+
+
+def _user_key(user_id):
+    return f'jwt-revoked-user:{user_id}'
+
+
+def revoke_token(token):
+    """Reject this token from now until it would have expired anyway."""
+    remaining = int(token['exp'] - time.time())
+    if remaining > 0:
+        cache.set(_token_key(token[api_settings.JTI_CLAIM]), True, remaining)
+
+
+def revoke_user_tokens(user_id):
+    """Reject every token issued to the user before now, e.g. after a password change."""
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    cache.set(_user_key(user_id), int(time.time()), int(lifetime.total_seconds()))
+
+
+def is_revoked(token):
+    token_key = _token_key(token.get(api_settings.JTI_CLAIM))
+    user_key = _user_key(token.get(api_settings.USER_ID_CLAIM))
+    found = cache.get_many([token_key, user_key])
+    if token_key in found:
+        return True
+    revoked_at = found.get(user_key)
+    return revoked_at is not None and token.get('iat', 0) < revoked_at
+
+
+# Profiles
+
+class ProfileCache:
+    """Thread-safe LRU cache of UserProfile rows that expire after ttl seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (expires, profile)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        profile = get_user_model().objects.filter(pk=user_id).first()
+        if profile is not None and self.maxsize:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, profile)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return profile
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+# Per process: other workers see a change once their entry expires.
+profiles = ProfileCache(settings.AUTH_PROFILE_CACHE_SIZE, settings.AUTH_PROFILE_CACHE_TTL)
+
+
+class ClaimsUser(TokenUser):
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def profile(self):
+        return profiles.get(self.id)
+
+    # Django model permissions are not in the token; superusers have them
+    # all, anyone else needs the profile.
+    def has_perm(self, perm, obj=None):
+        if self.is_superuser:
+            return True
+        return self.profile is not None and self.profile.has_perm(perm, obj)
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, module):
+        if self.is_superuser:
+            return True
+        return self.profile is not None and self.profile.has_module_perms(module)
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token):
+            raise InvalidToken('Token has been revoked')
+        return validated_token
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuse revoked refresh tokens and re-stamp claims from the user row.
+
+    Replaces the parent's validate() rather than extending it, so the user
+    row it loads anyway is the one the new claims come from. Refresh tokens
+    are not rotated (ROTATE_REFRESH_TOKENS is off).
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        # Otherwise a revoked refresh token could still mint fresh access tokens.
+        if is_revoked(refresh):
+            raise InvalidToken('Token has been revoked')
+
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        _stamp_claims(refresh, user)
+        return {'access': str(refresh.access_token)}
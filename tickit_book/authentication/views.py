@@ -1,11 +1,18 @@
 # authentication/views.py
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework import status
-from .serializers import UserSerializer, LoginSerializer
-from django.contrib.auth import authenticate, login, logout, get_user_model #changed import
+from .serializers import UserSerializer, LoginSerializer, LogoutSerializer, RegistrationSerializer
+from django.contrib.auth import authenticate, get_user_model #changed import
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .cache import get_profile_data, invalidate_profile
+from .throttles import LoginAccountThrottle, LoginIPThrottle, PasswordChangeThrottle
+from .tokens import StatelessJWTAuthentication, profiles, revoke_token, revoke_user_tokens, tokens_for_user
 
 
 User = get_user_model() # Use get_user_model()
@@ -13,9 +20,11 @@ User = get_user_model() # Use get_user_model()
 
 class UserRegistrationView(APIView):
     permission_classes = [AllowAny]
+    # Each registration costs a password hash, like a login.
+    throttle_classes = [LoginIPThrottle]
 
     def post(self, request):
-        serializer = UserSerializer(data=request.data)
+        serializer = RegistrationSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response({'message': 'User registered successfully'}, status=status.HTTP_201_CREATED)
@@ -23,6 +32,7 @@ class UserRegistrationView(APIView):
 
 class UserLoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [LoginIPThrottle, LoginAccountThrottle]
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -31,38 +41,82 @@ class UserLoginView(APIView):
             password = serializer.validated_data['password']
             user = authenticate(request, username=username, password=password)
             if user:
-                login(request, user)
-                return Response({'message': 'Login successful'}, status=status.HTTP_200_OK)
+                # Tokens only: no session row is written for API logins.
+                refresh = tokens_for_user(user)
+                return Response({
+                    'message': 'Login successful',
+                    'refresh': str(refresh),
+                    'access': str(refresh.access_token),
+                }, status=status.HTTP_200_OK)
             else:
                 return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class UserLogoutView(APIView):
+    # Holding the refresh token is enough to give it up. Authentication is
+    # off so an expired access token is not turned away with a 401 before
+    # post() runs; a still-valid one sent along is revoked as well.
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
     def post(self, request):
-        logout(request)
+        serializer = LogoutSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            refresh = RefreshToken(serializer.validated_data['refresh'])
+        except TokenError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        access = self.get_access_token(request)
+        if access is not None:
+            if refresh.get(api_settings.USER_ID_CLAIM) != access.get(api_settings.USER_ID_CLAIM):
+                return Response({'error': 'Refresh token belongs to another user'}, status=status.HTTP_400_BAD_REQUEST)
+            revoke_token(access)
+        refresh.blacklist()
         return Response({'message': 'Logout successful'}, status=status.HTTP_200_OK)
 
+    def get_access_token(self, request):
+        """The validated access token from the Authorization header, or None."""
+        authentication = StatelessJWTAuthentication()
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        try:
+            return authentication.get_validated_token(raw_token)
+        except InvalidToken:
+            return None
+
 class UserProfileView(APIView):
+    permission_classes = [IsAuthenticated]
+
     def get(self, request, username=None):
         if username:
-            user = get_object_or_404(User, username=username)
-            serializer = UserSerializer(user)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            data = get_profile_data(username, UserSerializer)
+            if data is None:
+                raise Http404
+            return Response(data, status=status.HTTP_200_OK)
         else:
-            serializer = UserSerializer(request.user)
+            # request.user only carries the token's claims
+            serializer = UserSerializer(request.user.profile)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
     def put(self, request):
-        user = request.user
+        user = get_object_or_404(User, pk=request.user.id)
         serializer = UserSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            profiles.invalidate(user.pk)
+            invalidate_profile(user.username)
             return Response({'message': 'Profile updated successfully'}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class ChangePasswordView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [LoginIPThrottle, PasswordChangeThrottle]
+
     def post(self, request):
-        user = request.user
+        user = get_object_or_404(User, pk=request.user.id)
         old_password = request.data.get('old_password')
         new_password = request.data.get('new_password')
 
@@ -74,6 +128,9 @@ class ChangePasswordView(APIView):
 
         user.set_password(new_password)
         user.save()
+        profiles.invalidate(user.pk)
+        # Tokens issued with the old password stop working immediately
+        revoke_user_tokens(user.pk)
         return Response({'message': 'Password changed successfully'}, status=status.HTTP_200_OK)
 
 
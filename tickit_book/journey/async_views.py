@@ -0,0 +1,90 @@
+import base64
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+from django.db.models import Q
+from .cache import aget_seat_map
+from .models import Journey
+from .search import search_journeys
+from .seatmap import abuild_seat_map
+from .serializers import JourneySerializer
+
+# Native async counterparts of the read-only journey endpoints, for
+# deployments serving tickit_book.asgi:application from an ASGI server such
+# as uvicorn. They use the async ORM directly, so a slow client costs an
+# idle coroutine instead of a blocked worker thread.
+# JourneySerializer is safe to call here because Journey has no relations
+# that would be fetched lazily during serialization.
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _encode_cursor(journey):
+    return base64.urlsafe_b64encode(f'{journey.departure_time.isoformat()}|{journey.pk}'.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        departure, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return parse_datetime(departure), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _page_size(request):
+    try:
+        return max(1, min(int(request.GET.get('page_size', PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        return PAGE_SIZE
+
+
+@require_GET
+async def journey_list(request):
+    queryset = search_journeys(
+        Journey.objects.all(),
+        source=request.GET.get('source'),
+        destination=request.GET.get('destination')
+    )
+    if request.GET.get('upcoming', 'true').lower() == 'true':
+        queryset = queryset.filter(departure_time__gte=timezone.now())
+
+    # Keyset pagination on (departure_time, id), matching JourneyPagination.
+    cursor = request.GET.get('cursor')
+    if cursor:
+        position = _decode_cursor(cursor)
+        if position is None or position[0] is None:
+            return JsonResponse({'detail': 'Invalid cursor'}, status=400)
+        departure, pk = position
+        queryset = queryset.filter(Q(departure_time__gt=departure) | Q(departure_time=departure, pk__gt=pk))
+
+    size = _page_size(request)
+    journeys = [journey async for journey in queryset.order_by('departure_time', 'id')[:size + 1]]
+    next_cursor = _encode_cursor(journeys[size - 1]) if len(journeys) > size else None
+
+    return JsonResponse({
+        'next': next_cursor,
+        'results': [JourneySerializer(journey).data for journey in journeys[:size]],
+    })
+
+
+@require_GET
+async def journey_detail(request, pk):
+    try:
+        journey = await Journey.objects.aget(pk=pk)
+    except Journey.DoesNotExist:
+        raise Http404
+    return JsonResponse(JourneySerializer(journey).data)
+
+
+@require_GET
+async def journey_seat_map(request, pk):
+    etag, payload = await aget_seat_map(pk, abuild_seat_map)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(payload)
+    response['ETag'] = etag
+    return response
@@ -0,0 +1,171 @@
+from collections import Counter
+from django.db import transaction
+from django.db.models import Case, Count, Q, Sum, Value, When
+from .cache import invalidate_availability
+from .models import Booking, Journey, Seat, SeatClassAvailability
+
+# Seat is the source of truth for availability: a seat is free exactly when
+# is_booked is False. SeatClassAvailability and Journey.available_seats are
+# denormalized counters over it, maintained by journey.services and checked
+# here.
+
+
+def create_seat_classes(parsed):
+    """Create the counters for new journeys from (Journey, seat_classes) pairs."""
+    SeatClassAvailability.objects.bulk_create([
+        SeatClassAvailability(journey=journey, seat_class=seat_class, total_seats=count, available_seats=count)
+        for journey, seat_classes in parsed
+        for seat_class, count in Counter(
+            seat_class for _, seat_class in journey.seat_layout(seat_classes)
+        ).items()
+    ])
+
+
+def seat_class_availability(journey_id):
+    return list(
+        SeatClassAvailability.objects.filter(journey_id=journey_id)
+        .order_by('seat_class')
+        .values('seat_class', 'total_seats', 'available_seats')
+    )
+
+
+def _seat_counts(journey_ids):
+    # The one GROUP BY that everything is checked against.
+    rows = (
+        Seat.objects.filter(journey_id__in=journey_ids)
+        .values('journey_id', 'seat_class')
+        .annotate(total=Count('id'), free=Count('id', filter=Q(is_booked=False)))
+        .order_by()
+        .values_list('journey_id', 'seat_class', 'total', 'free')
+    )
+    return {(journey_id, seat_class): (total, free) for journey_id, seat_class, total, free in rows}
+
+
+def _journey_free(journey_ids, seat_counts):
+    """Return ({journey_id: free seats}, booking mismatches) for journeys with seats.
+
+    Every live booking should own seat_count seats. Bookings made before
+    seats were allocated to every booking own none, so the seats they hold
+    are taken off the journey counter; other mismatches are only reported.
+    """
+    free, booked = {}, {}
+    for (journey_id, _), (total, count) in seat_counts.items():
+        free[journey_id] = free.get(journey_id, 0) + count
+        booked[journey_id] = booked.get(journey_id, 0) + total - count
+
+    mismatched = []
+    for journey_id, seat_count in (
+        Booking.objects.filter(journey_id__in=journey_ids)
+        .exclude(status=Booking.BookingStatus.CANCELLED)
+        .values('journey_id').annotate(seat_count=Sum('seat_count')).order_by()
+        .values_list('journey_id', 'seat_count')
+    ):
+        if journey_id in booked and seat_count != booked[journey_id]:
+            mismatched.append({
+                'journey': journey_id,
+                'booked_seats': booked[journey_id],
+                'booking_seat_count': seat_count,
+            })
+            free[journey_id] = max(0, free[journey_id] - max(0, seat_count - booked[journey_id]))
+    return free, mismatched
+
+
+def _find_drift(journey_ids):
+    expected = _seat_counts(journey_ids)
+    actual = {
+        (row.journey_id, row.seat_class): (row.total_seats, row.available_seats)
+        for row in SeatClassAvailability.objects.filter(journey_id__in=journey_ids)
+    }
+
+    drift = []
+    for key in sorted(expected.keys() | actual.keys()):
+        if expected.get(key) != actual.get(key):
+            drift.append({
+                'journey': key[0],
+                'seat_class': key[1],
+                'expected': expected.get(key),
+                'actual': actual.get(key),
+            })
+
+    # Journeys without Seat rows predate seat allocation; their counter is
+    # the only record there is, so it is left alone.
+    journey_free, mismatched = _journey_free(journey_ids, expected)
+    for journey_id, available_seats in Journey.objects.filter(
+        pk__in=journey_free
+    ).values_list('id', 'available_seats'):
+        if available_seats != journey_free[journey_id]:
+            drift.append({
+                'journey': journey_id,
+                'seat_class': None,
+                'expected': journey_free[journey_id],
+                'actual': available_seats,
+            })
+
+    return drift, mismatched
+
+
+def _repair(journey_ids):
+    with transaction.atomic():
+        # Lock in the order bookings do (class counters, then journeys), then
+        # recount: a booking that has claimed seats but not yet updated the
+        # counters is blocked until we commit and then applies its decrement
+        # on top of the recomputed value.
+        counters = list(
+            SeatClassAvailability.objects.select_for_update()
+            .filter(journey_id__in=journey_ids).order_by('pk')
+        )
+        list(Journey.objects.select_for_update().filter(pk__in=journey_ids).order_by('pk').values_list('pk'))
+        expected = _seat_counts(journey_ids)
+        journey_free, _ = _journey_free(journey_ids, expected)
+
+        stale = set()
+        for counter in counters:
+            key = (counter.journey_id, counter.seat_class)
+            if key not in expected:
+                stale.add(counter.pk)
+            else:
+                counter.total_seats, counter.available_seats = expected.pop(key)
+        SeatClassAvailability.objects.filter(pk__in=stale).delete()
+        SeatClassAvailability.objects.bulk_update(
+            [counter for counter in counters if counter.pk not in stale],
+            ['total_seats', 'available_seats']
+        )
+        SeatClassAvailability.objects.bulk_create([
+            SeatClassAvailability(journey_id=journey_id, seat_class=seat_class, total_seats=total, available_seats=free)
+            for (journey_id, seat_class), (total, free) in expected.items()
+        ])
+
+        if journey_free:
+            Journey.objects.filter(pk__in=journey_free).update(available_seats=Case(
+                *[When(pk=journey_id, then=Value(free)) for journey_id, free in journey_free.items()]
+            ))
+        invalidate_availability(journey_ids)
+
+
+def reconcile_availability(batch_size=500, repair=False):
+    """Check the availability counters journey by journey, yielding one report per chunk.
+
+    With repair=True drifted journeys are recomputed from Seat under row
+    locks, so it is safe to run against live traffic.
+    """
+    last_id = 0
+    while True:
+        journey_ids = list(
+            Journey.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not journey_ids:
+            return
+        last_id = journey_ids[-1]
+
+        drift, mismatched = _find_drift(journey_ids)
+        drifted = sorted({row['journey'] for row in drift})
+        if drifted and repair:
+            _repair(drifted)
+
+        yield {
+            'first_journey': journey_ids[0],
+            'journeys': len(journey_ids),
+            'drift': drift,
+            'booking_mismatches': mismatched,
+            'repaired': len(drifted) if repair else 0,
+        }
@@ -0,0 +1,192 @@
+import random
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from authentication.tokens import tokens_for_user
+from .importer import import_batch
+from .models import Booking, Journey, Station
+from .services import InsufficientSeats, SeatUnavailable, book_journey
+
+# Everything seeded here is tagged so it can be found and removed again.
+TAG = 'BENCH'
+USER_PREFIX = 'bench-'
+CITIES = (
+    'Amsterdam', 'Barcelona', 'Berlin', 'Brussels', 'Budapest', 'Copenhagen', 'Dublin', 'Geneva',
+    'Hamburg', 'Lisbon', 'London', 'Lyon', 'Madrid', 'Milan', 'Munich', 'Paris', 'Prague', 'Rome',
+    'Stockholm', 'Vienna', 'Warsaw', 'Zurich',
+)
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+# Host header sent by Django's in-process test clients.
+CLIENT_HOST = 'testserver'
+
+
+def client_settings(**overrides):
+    """override_settings() that also admits the test clients' host.
+
+    The test runner adds it to ALLOWED_HOSTS itself; management commands
+    driving the API in-process have to, or every request is a 400.
+    """
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, CLIENT_HOST], **overrides)
+
+
+def clean():
+    """Remove every journey, booking and user created by seed()."""
+    Booking.objects.filter(journey__transport_name=TAG).delete()
+    Journey.objects.filter(transport_name=TAG).delete()
+    get_user_model().objects.filter(username__startswith=USER_PREFIX).delete()
+    Station.objects.filter(departures__isnull=True, arrivals__isnull=True).delete()
+
+
+def seed(journeys=1000, seats=50, users=200, bookings=1000, seed=0, batch_size=1000):
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    created = 0
+    while created < journeys:
+        batch = []
+        for _ in range(min(batch_size, journeys - created)):
+            source, destination = rng.sample(CITIES, 2)
+            departure = now + timedelta(days=rng.randint(1, 60), minutes=rng.randrange(0, 24 * 60, 5))
+            batch.append((Journey(
+                source=source,
+                destination=destination,
+                departure_time=departure,
+                arrival_time=departure + timedelta(minutes=rng.randint(60, 600)),
+                transport_type=rng.choice(Journey.TransportType.values),
+                transport_name=TAG,
+                transport_number=f'{TAG}{created + len(batch)}',
+                total_seats=seats,
+                available_seats=seats,
+                price=Decimal(rng.randint(10, 300)),
+            ), [('Business', seats // 5), ('Economy', seats - seats // 5)]))
+        created += import_batch(batch)
+
+    # One hash shared by every account: hashing is deliberately slow and is
+    # not what the benchmark measures.
+    password = make_password(f'{TAG}-password')
+    User = get_user_model()
+    User.objects.bulk_create([
+        User(username=f'{USER_PREFIX}{index}', email=f'{USER_PREFIX}{index}@example.com', password=password)
+        for index in range(users)
+    ], batch_size=batch_size, ignore_conflicts=True)
+
+    user_list = list(User.objects.filter(username__startswith=USER_PREFIX))
+    journey_list = list(Journey.objects.filter(transport_name=TAG))
+    booked = 0
+    for _ in range(bookings):
+        try:
+            book_journey(rng.choice(user_list).pk, rng.choice(journey_list), rng.randint(1, 3))
+            booked += 1
+        except (InsufficientSeats, SeatUnavailable):
+            pass
+    return {'journeys': created, 'users': len(user_list), 'bookings': booked}
+
+
+class _Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}  # endpoint -> [(seconds, queries, ok)]
+
+    def call(self, endpoint, method, path, expected, **kwargs):
+        started = time.perf_counter()
+        response = method(path, **kwargs)
+        elapsed = time.perf_counter() - started
+        match = SERVER_TIMING_QUERIES.search(response.get('Server-Timing', ''))
+        sample = (elapsed, int(match.group(1)) if match else None, response.status_code == expected)
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(sample)
+        return response if sample[2] else None
+
+
+def _session(client, rng, recorder, journeys, cancel_rate):
+    """One simulated customer: search, look at a seat map, book, pay, maybe cancel."""
+    source, destination = rng.sample(CITIES, 2)
+    recorder.call('search', client.get, reverse('journey-list-create'), 200,
+                  data={'source': source, 'destination': destination})
+
+    journey_id = rng.choice(journeys)
+    recorder.call('seat-map', client.get, reverse('journey-seat-map', args=[journey_id]), 200)
+
+    response = recorder.call('book', client.post, reverse('booking-list-create'), 201,
+                             data={'journey': journey_id, 'seat_count': 1}, format='json')
+    if response is None:
+        return
+    booking = response.data
+    recorder.call('pay', client.post, reverse('payment-list-create'), 201, format='json', data={
+        'booking': booking['id'], 'amount': booking['total_price'], 'payment_method': 'card'
+    })
+    if rng.random() < cancel_rate:
+        recorder.call('cancel', client.delete, reverse('booking-detail', args=[booking['id']]), 204)
+
+
+def latency_summary(latencies):
+    """Return the mean, median and 99th percentile of durations in seconds, in milliseconds."""
+    latencies = sorted(latencies)
+    return {
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def _summarize(samples, elapsed):
+    latency = latency_summary(seconds for seconds, _, _ in samples)
+    queries = [count for _, count, _ in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, ok in samples if not ok),
+        'throughput': round(len(samples) / elapsed, 2),
+        'p50_ms': round(latency['p50_ms'], 2),
+        'p99_ms': round(latency['p99_ms'], 2),
+        'mean_queries': round(statistics.fmean(queries), 2) if queries else None,
+    }
+
+
+def run(sessions=500, concurrency=16, cancel_rate=0.3, seed=0):
+    """Drive the API with concurrent customers; returns per-endpoint figures."""
+    users = list(get_user_model().objects.filter(username__startswith=USER_PREFIX)[:concurrency])
+    journeys = list(Journey.objects.filter(
+        transport_name=TAG, departure_time__gt=timezone.now()
+    ).values_list('pk', flat=True))
+    if not users or not journeys:
+        raise ValueError("No benchmark data; seed first")
+
+    recorder = _Recorder()
+
+    def worker(index):
+        client = APIClient(raise_request_exception=False)
+        # A real token, so authentication is part of what is measured.
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(users[index % len(users)]).access_token}')
+        rng = random.Random(seed * 1000 + index)
+        try:
+            for _ in range(sessions // concurrency + (index < sessions % concurrency)):
+                _session(client, rng, recorder, journeys, cancel_rate)
+        finally:
+            connections.close_all()
+
+    # Query counts are read back from the Server-Timing header.
+    with client_settings(METRICS_SERVER_TIMING=True):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'elapsed_seconds': round(elapsed, 3),
+        'endpoints': {
+            endpoint: _summarize(samples, elapsed)
+            for endpoint, samples in sorted(recorder.samples.items())
+        },
+    }
@@ -0,0 +1,143 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import Journey, normalize_place
+from .search import matching_stations
+
+# Search results are cached per route and invalidated through generation
+# stamps: a journey write drops the stamps of the stations it touches, so only
+# searches that could include that journey miss. Stamps are timestamps rather
+# than counters so a dropped or evicted stamp can never be recreated with a
+# value an older cache entry was built against.
+ALL_ROUTES = 'journey-gen:all'
+STATIONS_GEN = 'journey-gen:stations'
+
+
+def _station_gen_key(station_id):
+    return f'journey-gen:station:{station_id}'
+
+
+def _seats_key(journey_id):
+    return f'journey-seats:{journey_id}'
+
+
+def _generations(keys):
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def cached_station_ids(term):
+    key = normalize_place(term)
+    stations_gen, = _generations([STATIONS_GEN])
+    cache_key = f'journey-stations:{stations_gen}:{hashlib.md5(key.encode()).hexdigest()}'
+    station_ids = cache.get(cache_key)
+    if station_ids is None:
+        station_ids = [row['pk'] for row in matching_stations(key)]
+        cache.set(cache_key, station_ids, settings.JOURNEY_SEARCH_CACHE_TIMEOUT)
+    return station_ids
+
+
+def search_cache_key(request):
+    params = request.query_params
+    source = params.get('source')
+    destination = params.get('destination')
+
+    # Any journey a search can return departs from one of the matched source
+    # stations (or arrives at a matched destination), so those stamps are
+    # enough to invalidate it precisely.
+    if source:
+        gen_keys = [_station_gen_key(pk) for pk in cached_station_ids(source)]
+    elif destination:
+        gen_keys = [_station_gen_key(pk) for pk in cached_station_ids(destination)]
+    else:
+        gen_keys = [ALL_ROUTES]
+
+    parts = [
+        request.get_host(),
+        normalize_place(source or ''),
+        normalize_place(destination or ''),
+        params.get('upcoming', 'true').lower(),
+        params.get('cursor', ''),
+        params.get('page_size', ''),
+    ] + [str(gen) for gen in _generations(gen_keys)]
+    return 'journey-search:' + hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def overlay_availability(results):
+    """Return a copy of serialized journeys with live available_seats."""
+    keys = {_seats_key(journey['id']): journey['id'] for journey in results}
+    counts = {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+
+    missing = [pk for pk in keys.values() if pk not in counts]
+    if missing:
+        fresh = dict(Journey.objects.filter(pk__in=missing).values_list('id', 'available_seats'))
+        cache.set_many(
+            {_seats_key(pk): value for pk, value in fresh.items()},
+            settings.JOURNEY_SEARCH_CACHE_TIMEOUT
+        )
+        counts.update(fresh)
+
+    return [
+        {**journey, 'available_seats': counts.get(journey['id'], journey['available_seats'])}
+        for journey in results
+    ]
+
+
+def invalidate_availability(journey_ids):
+    keys = [_seats_key(pk) for pk in journey_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_routes(station_ids):
+    keys = [ALL_ROUTES] + [_station_gen_key(pk) for pk in station_ids if pk is not None]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_journey(journey):
+    station_ids = {journey.source_station_id, journey.destination_station_id}
+    station_ids.update(getattr(journey, '_previous_station_ids', ()))
+    invalidate_routes(station_ids)
+    invalidate_availability([journey.pk])
+    invalidate_seat_map([journey.pk])
+
+
+def invalidate_stations():
+    transaction.on_commit(lambda: cache.delete(STATIONS_GEN))
+
+
+def _seat_map_key(journey_id):
+    return f'journey-seat-map:{journey_id}'
+
+
+def get_seat_map(journey_id, build):
+    """Return (etag, payload), calling build(journey_id) on a cache miss."""
+    key = _seat_map_key(journey_id)
+    entry = cache.get(key)
+    if entry is None:
+        payload = build(journey_id)
+        etag = '"%s"' % hashlib.md5(repr(payload).encode()).hexdigest()
+        entry = (etag, payload)
+        cache.set(key, entry, settings.SEAT_MAP_CACHE_TIMEOUT)
+    return entry
+
+
+async def aget_seat_map(journey_id, abuild):
+    key = _seat_map_key(journey_id)
+    entry = await cache.aget(key)
+    if entry is None:
+        payload = await abuild(journey_id)
+        etag = '"%s"' % hashlib.md5(repr(payload).encode()).hexdigest()
+        entry = (etag, payload)
+        await cache.aset(key, entry, settings.SEAT_MAP_CACHE_TIMEOUT)
+    return entry
+
+
+def invalidate_seat_map(journey_ids):
+    keys = [_seat_map_key(pk) for pk in journey_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,102 @@
+import csv
+from datetime import datetime, time, timedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Booking
+
+# (column, lookup) pairs for one row per booking, joined to its journey and
+# (if any) its payment. Rows are fetched as tuples, never model instances.
+COLUMNS = (
+    ('booking_id', 'id'),
+    ('booking_reference', 'booking_reference'),
+    ('booking_status', 'status'),
+    ('booking_time', 'booking_time'),
+    ('cancelled_time', 'cancelled_time'),
+    ('user_id', 'user_id'),
+    ('seat_count', 'seat_count'),
+    ('total_price', 'total_price'),
+    ('journey_id', 'journey_id'),
+    ('source', 'journey__source'),
+    ('destination', 'journey__destination'),
+    ('departure_time', 'journey__departure_time'),
+    ('transport_type', 'journey__transport_type'),
+    ('transport_number', 'journey__transport_number'),
+    ('payment_id', 'payment__id'),
+    ('payment_status', 'payment__status'),
+    ('payment_amount', 'payment__amount'),
+    ('payment_method', 'payment__payment_method'),
+    ('transaction_id', 'payment__transaction_id'),
+    ('payment_time', 'payment__payment_time'),
+)
+HEADER = [column for column, _ in COLUMNS]
+
+# Only indexed columns can be filtered on, so a date range never turns into
+# a scan of the whole table.
+DATE_FIELDS = {
+    'booking_time': 'booking_time',
+    'payment_time': 'payment__payment_time',
+}
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def parse_bound(value, end=False):
+    """Parse a date or datetime; a bare end date includes that whole day."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"invalid date {value!r}")
+        parsed = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def export_rows(start=None, end=None, date_field='booking_time', chunk_size=2000, using=None):
+    """Yield one tuple per booking in HEADER order, ordered by date_field.
+
+    iterator() streams the result through a server-side cursor on
+    PostgreSQL, so memory use does not grow with the export.
+    """
+    lookup = DATE_FIELDS[date_field]
+    rows = Booking.objects.using(using)
+    if start:
+        rows = rows.filter(**{f'{lookup}__gte': start})
+    if end:
+        rows = rows.filter(**{f'{lookup}__lt': end})
+    return (
+        rows.order_by(lookup, 'id')
+        .values_list(*(lookup for _, lookup in COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Echo:
+    # csv.writer wants a file; this one hands each line straight back.
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_jsonl(rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(HEADER, row))) + '\n'
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'jsonl': render_jsonl,
+}
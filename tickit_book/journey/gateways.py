@@ -0,0 +1,52 @@
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+@dataclass
+class ChargeResult:
+    success: bool
+    reference: str = ''
+    message: str = ''
+
+
+class PaymentGateway:
+    """Interface for payment providers; charge() and refund() may block for seconds.
+
+    A payment whose worker died mid-charge is charged again, so
+    implementations must pass payment.transaction_id to the provider as its
+    idempotency key.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+
+    def charge(self, payment):
+        raise NotImplementedError
+
+    def refund(self, payment):
+        raise NotImplementedError
+
+
+class FakeGateway(PaymentGateway):
+    """Local stand-in that sleeps like a real provider and can fail on demand."""
+
+    def charge(self, payment):
+        time.sleep(self.options.get('latency', 0))
+        if random.random() < self.options.get('failure_rate', 0):
+            return ChargeResult(success=False, message='Card declined')
+        return ChargeResult(success=True, reference=f'fake_{uuid.uuid4().hex}')
+
+    def refund(self, payment):
+        time.sleep(self.options.get('latency', 0))
+        return ChargeResult(success=True, reference=f'fake_refund_{uuid.uuid4().hex}')
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    config = settings.PAYMENT_GATEWAY
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
@@ -0,0 +1,133 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def _fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """Replay the stored response when a create is retried with the same Idempotency-Key.
+
+    The key is claimed in its own short transaction, so a concurrent retry
+    sees the claim and gets a 409 instead of running the view twice. The
+    view then runs in one transaction with the claim row locked, and the
+    response is stored in that same transaction: either the booking and its
+    stored response commit together or neither does. Only successful
+    responses are stored; anything else releases the key so the client can
+    try again.
+
+    An in-flight claim is a lease of IDEMPOTENCY_LEASE seconds. If the worker
+    holding it dies, its transaction and row lock go with it and the key can
+    be reclaimed once the lease runs out; a live worker keeps the row locked,
+    so its claim is never taken over.
+    """
+
+    # Hooks post() rather than create() so views can keep overriding create().
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return super().post(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {'detail': f'{HEADER} must be at most 255 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        lookup = {
+            'user_id': request.user.pk,
+            'endpoint': request.resolver_match.url_name,
+            'key': key,
+        }
+        fingerprint = _fingerprint(request.data)
+
+        record, response = self._claim(lookup, fingerprint)
+        if response is not None:
+            return response
+
+        try:
+            with transaction.atomic():
+                # expires_at identifies this claim: a reclaim would have moved it.
+                claim = IdempotencyKey.objects.select_for_update().filter(
+                    pk=record.pk, expires_at=record.expires_at, response_status__isnull=True
+                )
+                if not claim.exists():
+                    return self._in_flight()
+
+                response = super().post(request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    claim.update(
+                        response_status=response.status_code,
+                        response_body=response.data,
+                        expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+                    )
+                else:
+                    claim.delete()
+        except Exception:
+            # Everything the view wrote was rolled back with it.
+            IdempotencyKey.objects.filter(
+                pk=record.pk, expires_at=record.expires_at, response_status__isnull=True
+            ).delete()
+            raise
+        return response
+
+    def _claim(self, lookup, fingerprint):
+        """Return (record, None) if this request now holds the key, else (None, response)."""
+        now = timezone.now()
+        lease = now + timedelta(seconds=settings.IDEMPOTENCY_LEASE)
+        try:
+            with transaction.atomic():
+                # nowait: a locked row belongs to a request that is still running.
+                record = IdempotencyKey.objects.select_for_update(nowait=True).filter(**lookup).first()
+                if record is None:
+                    return IdempotencyKey.objects.create(request_hash=fingerprint, expires_at=lease, **lookup), None
+                if record.expires_at > now:
+                    return None, self._replay(record, fingerprint)
+
+                # A stored response past its TTL, or a lease whose holder died.
+                record.request_hash = fingerprint
+                record.response_status = record.response_body = None
+                record.expires_at = lease
+                record.save(update_fields=['request_hash', 'response_status', 'response_body', 'expires_at'])
+                return record, None
+        except (IntegrityError, OperationalError):
+            # Another request claimed the key first, or is running under it.
+            record = IdempotencyKey.objects.filter(**lookup).first()
+            if record is None or record.response_status is None:
+                return None, self._in_flight()
+            return None, self._replay(record, fingerprint)
+
+    def _in_flight(self):
+        return Response(
+            {'detail': f'A request with this {HEADER} is still being processed'},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    def _replay(self, record, fingerprint):
+        if record.request_hash != fingerprint:
+            return Response(
+                {'detail': f'{HEADER} was already used with a different request'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if record.response_status is None:
+            return self._in_flight()
+        return Response(record.response_body, status=record.response_status)
+
+
+def prune_idempotency_keys(batch_size=1000):
+    expired = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).order_by('expires_at')
+    pruned = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return pruned
+        pruned += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
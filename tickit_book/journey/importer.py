@@ -0,0 +1,173 @@
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from tickit_book.bulk_import import RowError, import_rows
+from .availability import create_seat_classes
+from .cache import invalidate_routes, invalidate_stations
+from .models import Journey, Seat, Station, normalize_place
+from .serializers import check_journey_rules
+from .signals import journeys_imported
+
+REQUIRED_FIELDS = (
+    'source', 'destination', 'departure_time', 'arrival_time',
+    'transport_name', 'transport_number', 'total_seats', 'price',
+)
+TEXT_FIELDS = ('source', 'destination', 'transport_name', 'transport_number')
+
+
+def _parse_datetime(value, field):
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise RowError(f"{field}: invalid datetime {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _parse_int(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f"{field}: invalid integer {value!r}")
+
+
+def _parse_text(value, field):
+    # JSON rows can carry numbers, lists or objects where text belongs.
+    if not isinstance(value, str) or not value.strip():
+        raise RowError(f"{field}: expected text, got {value!r}")
+    value = value.strip()
+    max_length = Journey._meta.get_field(field).max_length
+    if len(value) > max_length:
+        raise RowError(f"{field}: longer than {max_length} characters")
+    return value
+
+
+def _parse_price(value):
+    try:
+        price = Decimal(str(value))
+    except InvalidOperation:
+        raise RowError(f"price: invalid decimal {value!r}")
+    if not price.is_finite() or price <= 0:
+        raise RowError(f"price: must be a positive amount, got {value!r}")
+    try:
+        Journey._meta.get_field('price').run_validators(price)
+    except ValidationError as exc:
+        raise RowError(f"price: {' '.join(exc.messages)}")
+    return price
+
+
+def _parse_seat_classes(value, total_seats):
+    # "Business:20,Economy:180"
+    if value in (None, ''):
+        return None
+    if not isinstance(value, str):
+        raise RowError(f"seat_classes: expected text, got {value!r}")
+    max_length = Seat._meta.get_field('seat_class').max_length
+    seat_classes = []
+    for part in value.split(','):
+        name, _, count = part.partition(':')
+        name, count = name.strip(), _parse_int(count, 'seat_classes')
+        if not name or len(name) > max_length:
+            raise RowError(f"seat_classes: invalid class name {name!r}")
+        if count < 1:
+            raise RowError(f"seat_classes: {name} must have at least one seat")
+        seat_classes.append((name, count))
+    if sum(count for _, count in seat_classes) != total_seats:
+        raise RowError("seat_classes: counts must add up to total_seats")
+    return seat_classes
+
+
+def parse_row(row):
+    """Return (Journey, seat_classes) for a raw row or raise RowError."""
+    if not isinstance(row, dict):
+        raise RowError(f"invalid JSON: {row}")
+    missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, '')]
+    if missing:
+        raise RowError(f"missing fields: {', '.join(missing)}")
+
+    transport_type = row.get('transport_type') or Journey.TransportType.BUS
+    if not isinstance(transport_type, str) or transport_type not in Journey.TransportType.values:
+        raise RowError(f"transport_type: invalid choice {transport_type!r}")
+
+    total_seats = _parse_int(row['total_seats'], 'total_seats')
+    available_seats = row.get('available_seats')
+    available_seats = total_seats if available_seats in (None, '') else _parse_int(available_seats, 'available_seats')
+    if total_seats < 1 or available_seats < 0:
+        raise RowError("seat counts must be positive")
+
+    journey = Journey(
+        **{field: _parse_text(row[field], field) for field in TEXT_FIELDS},
+        departure_time=_parse_datetime(row['departure_time'], 'departure_time'),
+        arrival_time=_parse_datetime(row['arrival_time'], 'arrival_time'),
+        transport_type=transport_type,
+        total_seats=total_seats,
+        available_seats=available_seats,
+        price=_parse_price(row['price']),
+    )
+    try:
+        check_journey_rules(journey.departure_time, journey.arrival_time, total_seats, available_seats)
+    except serializers.ValidationError as exc:
+        raise RowError(' '.join(str(detail) for detail in exc.detail))
+
+    return journey, _parse_seat_classes(row.get('seat_classes'), total_seats)
+
+
+def _resolve_stations(journeys):
+    names = {}
+    for journey in journeys:
+        for name in (journey.source, journey.destination):
+            names.setdefault(normalize_place(name), ' '.join(name.split()))
+
+    stations = {s.search_name: s for s in Station.objects.filter(search_name__in=names)}
+    missing = [Station(name=names[key], search_name=key) for key in names if key not in stations]
+    if missing:
+        Station.objects.bulk_create(missing, ignore_conflicts=True)
+        stations.update(
+            (s.search_name, s) for s in Station.objects.filter(search_name__in=[s.search_name for s in missing])
+        )
+        invalidate_stations()
+
+    for journey in journeys:
+        journey.source_station = stations[normalize_place(journey.source)]
+        journey.destination_station = stations[normalize_place(journey.destination)]
+
+
+def _insert_seats(parsed):
+    # Seats outnumber journeys by two or three orders of magnitude, so they
+    # skip model instantiation and go straight to a parameterized executemany.
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}, {}, {}, {}) VALUES (%s, %s, %s, %s)'.format(
+        quote(Seat._meta.db_table),
+        quote('journey_id'), quote('seat_number'), quote('seat_class'), quote('is_booked')
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (journey.pk, seat_number, seat_class, False)
+            for journey, seat_classes in parsed
+            for seat_number, seat_class in journey.seat_layout(seat_classes)
+        ])
+
+
+def import_batch(parsed):
+    """Insert a batch of (Journey, seat_classes) pairs and their seats."""
+    journeys = [journey for journey, _ in parsed]
+    with transaction.atomic():
+        _resolve_stations(journeys)
+        Journey.objects.bulk_create(journeys)
+        _insert_seats(parsed)
+        create_seat_classes(parsed)
+        journeys_imported.send(sender=Journey, journey_ids=[journey.pk for journey in journeys])
+        invalidate_routes({j.source_station_id for j in journeys} | {j.destination_station_id for j in journeys})
+    return len(journeys)
+
+
+def _insert(parsed):
+    return import_batch([row for _, row in parsed]), []
+
+
+def import_journeys(rows, batch_size=1000):
+    """Validate and insert journey rows batch by batch; see import_rows()."""
+    return import_rows(rows, parse_row, _insert, batch_size)
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from journey.benchmark import client_settings, latency_summary
+from journey.models import Journey
+
+
+def _summary(name, latencies, elapsed):
+    latency = latency_summary(latencies)
+    return (f"{name}: {len(latencies) / elapsed:,.0f} req/s, "
+            f"p50 {latency['p50_ms']:.1f}ms, p99 {latency['p99_ms']:.1f}ms")
+
+
+class Command(BaseCommand):
+    help = "Compare in-process throughput of the WSGI (DRF) and ASGI (async) journey endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help="Threads for WSGI, in-flight coroutines for ASGI")
+        parser.add_argument('--endpoint', choices=['list', 'detail', 'seat-map'], default='list')
+
+    def handle(self, *args, **options):
+        journey = Journey.objects.order_by('pk').first()
+        if journey is None and options['endpoint'] != 'list':
+            self.stderr.write("No journeys to benchmark; import some first")
+            return
+
+        wsgi_url, asgi_url = {
+            'list': (reverse('journey-list-create'), reverse('journey-list-async')),
+            'detail': (reverse('journey-detail', args=[journey.pk] if journey else []),
+                       reverse('journey-detail-async', args=[journey.pk] if journey else [])),
+            'seat-map': (reverse('journey-seat-map', args=[journey.pk] if journey else []),
+                         reverse('journey-seat-map-async', args=[journey.pk] if journey else [])),
+        }[options['endpoint']]
+
+        count = options['requests']
+        concurrency = options['concurrency']
+        with client_settings():
+            self.stdout.write(_summary('WSGI', *self._run_wsgi(wsgi_url, count, concurrency)))
+            self.stdout.write(_summary('ASGI', *self._run_asgi(asgi_url, count, concurrency)))
+
+    def _run_wsgi(self, url, count, concurrency):
+        def fetch(_):
+            started = time.perf_counter()
+            response = Client().get(url)
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}")
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(fetch, range(count)))
+        return latencies, time.perf_counter() - started
+
+    def _run_asgi(self, url, count, concurrency):
+        async def run():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def fetch():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.get(url)
+                    if response.status_code != 200:
+                        raise CommandError(f"GET {url} returned {response.status_code}")
+                    return time.perf_counter() - started
+
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(fetch() for _ in range(count)))
+            return latencies, time.perf_counter() - started
+
+        return asyncio.run(run())
@@ -0,0 +1,87 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.test import Client
+from django.urls import reverse
+from journey.benchmark import client_settings, latency_summary
+from journey.models import Journey
+
+MODES = ('fresh', 'persistent', 'pool')
+
+
+class Command(BaseCommand):
+    help = "Compare per-request latency with a new DB connection per request, persistent connections and a pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--mode', choices=MODES, action='append',
+                            help="Repeatable; defaults to every mode the database supports")
+        parser.add_argument('--path', help="Defaults to the first journey's detail endpoint")
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        modes = options['mode'] or [
+            mode for mode in MODES if mode != 'pool' or connection.vendor == 'postgresql'
+        ]
+        if 'pool' in modes and connection.vendor != 'postgresql':
+            raise CommandError("Connection pooling needs PostgreSQL")
+
+        path = options['path']
+        if path is None:
+            journey = Journey.objects.order_by('pk').first()
+            path = reverse('journey-detail', args=[journey.pk]) if journey else reverse('journey-list-create')
+
+        original = {
+            'CONN_MAX_AGE': connection.settings_dict['CONN_MAX_AGE'],
+            'CONN_HEALTH_CHECKS': connection.settings_dict['CONN_HEALTH_CHECKS'],
+            'OPTIONS': connection.settings_dict['OPTIONS'],
+        }
+        try:
+            for mode in modes:
+                self._configure(connection, mode, original)
+                latency = latency_summary(self._run(path, options['requests']))
+                self.stdout.write(
+                    f"{mode:>10}: mean {latency['mean_ms']:.2f}ms, "
+                    f"p50 {latency['p50_ms']:.2f}ms, p99 {latency['p99_ms']:.2f}ms"
+                )
+        finally:
+            self._configure(connection, None, original)
+
+    def _configure(self, connection, mode, original):
+        # The connection (and any pool) is rebuilt from settings_dict on the
+        # next query, so each mode starts cold.
+        connection.close()
+        if connection.vendor == 'postgresql':
+            connection.close_pool()
+        connection.settings_dict.update(original)
+        connection.settings_dict['OPTIONS'] = {
+            key: value for key, value in original['OPTIONS'].items() if key != 'pool'
+        }
+        if mode == 'fresh':
+            connection.settings_dict['CONN_MAX_AGE'] = 0
+        elif mode == 'persistent':
+            connection.settings_dict['CONN_MAX_AGE'] = 600
+            connection.settings_dict['CONN_HEALTH_CHECKS'] = True
+        elif mode == 'pool':
+            connection.settings_dict['CONN_MAX_AGE'] = 0
+            connection.settings_dict['OPTIONS']['pool'] = {'min_size': 1, 'max_size': 4}
+        else:
+            connection.settings_dict['OPTIONS'] = original['OPTIONS']
+
+    def _run(self, path, count):
+        # The test client skips the close_old_connections() calls that the
+        # real handlers make at request start and finish, so they are made
+        # here: that is where a connection is closed, kept or returned to
+        # the pool.
+        client = Client()
+        latencies = []
+        with client_settings():
+            for _ in range(count):
+                started = time.perf_counter()
+                close_old_connections()
+                response = client.get(path)
+                close_old_connections()
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f"GET {path} returned {response.status_code}")
+        return latencies
@@ -0,0 +1,53 @@
+import multiprocessing
+import time
+from array import array
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from journey import references
+
+
+def _generate(count):
+    connections.close_all()
+    allocator = references.ReferenceAllocator()
+    values = array('Q')
+    started = time.perf_counter()
+    for _ in range(count):
+        reference = allocator.next_reference()
+        values.append(references.decode(reference))
+    elapsed = time.perf_counter() - started
+    connections.close_all()
+    return values, elapsed
+
+
+class Command(BaseCommand):
+    help = "Benchmark booking reference allocation and verify the references are unique"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1_000_000,
+                            help="Total references; 10M needs roughly 1GB for the uniqueness check")
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Separate processes, each with its own allocator")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        per_worker = options['count'] // workers
+        connections.close_all()
+
+        started = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            results = pool.map(_generate, [per_worker] * workers)
+        wall = time.perf_counter() - started
+
+        total = per_worker * workers
+        seen = set()
+        for values, elapsed in results:
+            seen.update(values)
+            self.stdout.write(f"worker: {len(values)} references in {elapsed:.2f}s "
+                              f"({len(values) / elapsed:,.0f}/s)")
+
+        blocks = -(-per_worker // references.BLOCK_SIZE) * workers
+        self.stdout.write(f"{total:,} references in {wall:.2f}s wall, {blocks:,} block reservations "
+                          f"({total / blocks:,.0f} references per database round trip)")
+        if len(seen) != total:
+            raise CommandError(f"{total - len(seen)} duplicate references")
+        self.stdout.write(self.style.SUCCESS(f"All {total:,} references are unique"))
@@ -0,0 +1,94 @@
+import json
+import subprocess
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from journey import benchmark
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic data and drive the booking API with concurrent clients"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-data', action='store_true', help="Seed before running")
+        parser.add_argument('--clean', action='store_true', help="Remove previously seeded data first")
+        parser.add_argument('--journeys', type=int, default=1000)
+        parser.add_argument('--seats', type=int, default=50, help="Seats per journey")
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--bookings', type=int, default=1000, help="Bookings seeded before the run")
+        parser.add_argument('--sessions', type=int, default=500,
+                            help="Customer sessions: search, seat map, book, pay and sometimes cancel")
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--cancel-rate', type=float, default=0.3)
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the results as JSON to this file")
+        parser.add_argument('--compare', help="Print the change against an earlier results file")
+
+    def handle(self, *args, **options):
+        if options['clean']:
+            benchmark.clean()
+        if options['seed_data']:
+            seeded = benchmark.seed(
+                journeys=options['journeys'], seats=options['seats'], users=options['users'],
+                bookings=options['bookings'], seed=options['random_seed']
+            )
+            self.stdout.write(f"Seeded {seeded}")
+
+        try:
+            results = benchmark.run(
+                sessions=options['sessions'], concurrency=options['concurrency'],
+                cancel_rate=options['cancel_rate'], seed=options['random_seed']
+            )
+        except ValueError as exc:
+            raise CommandError(f"{exc} (use --seed-data)")
+
+        results = {
+            'commit': _git_commit(),
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'options': {key: options[key] for key in ('sessions', 'concurrency', 'cancel_rate', 'random_seed')},
+            **results,
+        }
+
+        baseline = {}
+        if options['compare']:
+            with open(options['compare']) as stream:
+                baseline = json.load(stream).get('endpoints', {})
+
+        self.stdout.write(f"{'endpoint':<10} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'queries':>8} {'errors':>7}")
+        for endpoint, figures in results['endpoints'].items():
+            line = (
+                f"{endpoint:<10} {figures['throughput']:>9.1f} {figures['p50_ms']:>9.2f} "
+                f"{figures['p99_ms']:>9.2f} {figures['mean_queries'] or 0:>8.1f} {figures['errors']:>7}"
+            )
+            before = baseline.get(endpoint)
+            if before:
+                line += f"   p50 {_change(before['p50_ms'], figures['p50_ms'])}, p99 {_change(before['p99_ms'], figures['p99_ms'])}"
+            self.stdout.write(line)
+
+        failed = {endpoint: figures['errors'] for endpoint, figures in results['endpoints'].items() if figures['errors']}
+        if failed:
+            raise CommandError(
+                "Requests failed, so no results were saved: "
+                + ', '.join(f"{endpoint} {errors}" for endpoint, errors in failed.items())
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                json.dump(results, stream, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+
+def _change(before, after):
+    if not before:
+        return 'n/a'
+    return f"{(after - before) / before:+.1%}"
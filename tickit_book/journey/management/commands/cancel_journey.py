@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from journey.models import Journey
+from journey.services import cancel_journey_bookings
+
+
+class Command(BaseCommand):
+    help = "Cancel a journey and every live booking on it, releasing their seats"
+
+    def add_arguments(self, parser):
+        parser.add_argument('journey_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not Journey.objects.filter(pk=options['journey_id']).exists():
+            raise CommandError(f"Journey {options['journey_id']} does not exist")
+        cancelled = cancel_journey_bookings(options['journey_id'], batch_size=options['batch_size'])
+        self.stdout.write(f"Cancelled {cancelled} bookings")
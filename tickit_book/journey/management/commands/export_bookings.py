@@ -0,0 +1,31 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from journey.export import DATE_FIELDS, RENDERERS, export_rows, parse_bound
+
+
+class Command(BaseCommand):
+    help = "Stream bookings joined with their journey and payment as CSV or JSON lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(RENDERERS), default='csv')
+        parser.add_argument('--start', help="Date or datetime, inclusive")
+        parser.add_argument('--end', help="Date or datetime, exclusive; a bare date includes that day")
+        parser.add_argument('--date-field', choices=list(DATE_FIELDS), default='booking_time')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--output', help="Defaults to stdout")
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_bound(options['start'])
+            end = parse_bound(options['end'], end=True)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        rows = export_rows(start, end, date_field=options['date_field'], chunk_size=options['chunk_size'])
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for line in RENDERERS[options['format']](rows):
+                output.write(line)
+        finally:
+            if options['output']:
+                output.close()
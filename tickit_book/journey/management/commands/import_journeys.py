@@ -0,0 +1,10 @@
+from journey.importer import import_journeys
+from tickit_book.bulk_import import ImportCommand
+
+
+class Command(ImportCommand):
+    help = "Bulk import journeys and their seats from a CSV or JSON-lines file"
+    noun = 'journeys'
+
+    def run_import(self, rows, batch_size):
+        return import_journeys(rows, batch_size)
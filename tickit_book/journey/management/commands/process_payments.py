@@ -0,0 +1,35 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from journey.models import Payment
+from journey.payments import claimable, process_payment
+
+
+class Command(BaseCommand):
+    help = ("Charge PENDING payments, e.g. ones left behind by a restarted web worker, "
+            "and retry PROCESSING ones whose worker died mid-charge")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.PAYMENT_WORKERS)
+
+    def handle(self, *args, **options):
+        pending = list(
+            Payment.objects.filter(claimable()).values_list('id', flat=True)
+        )
+
+        def run(payment_id):
+            try:
+                return process_payment(payment_id)
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = [payment for payment in pool.map(run, pending) if payment]
+
+        counts = Counter(payment.status for payment in results)
+        self.stdout.write(f"Processed {len(results)} payments: "
+                          f"{counts[Payment.PaymentStatus.COMPLETED]} completed, "
+                          f"{counts[Payment.PaymentStatus.REFUNDED]} refunded (booking cancelled mid-charge), "
+                          f"{counts[Payment.PaymentStatus.FAILED]} failed")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from journey.idempotency import prune_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses past their TTL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        pruned = prune_idempotency_keys(batch_size=options['batch_size'])
+        self.stdout.write(f"Pruned {pruned} idempotency keys")
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from journey.availability import reconcile_availability
+
+
+class Command(BaseCommand):
+    help = "Recompute seat availability counters from the Seat table and report or repair drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--repair', action='store_true',
+                            help="Rewrite drifted counters instead of only reporting them")
+
+    def handle(self, *args, **options):
+        checked = drifted = repaired = mismatched = 0
+
+        for chunk in reconcile_availability(options['batch_size'], repair=options['repair']):
+            checked += chunk['journeys']
+            drifted += len({row['journey'] for row in chunk['drift']})
+            repaired += chunk['repaired']
+            mismatched += len(chunk['booking_mismatches'])
+            for row in chunk['drift']:
+                counter = row['seat_class'] or 'journey'
+                self.stderr.write(
+                    f"Journey {row['journey']} ({counter}): expected {row['expected']}, found {row['actual']}"
+                )
+            for row in chunk['booking_mismatches']:
+                self.stderr.write(
+                    f"Journey {row['journey']}: live bookings hold {row['booking_seat_count']} seats "
+                    f"but {row['booked_seats']} are marked booked"
+                )
+
+        self.stdout.write(
+            f"Checked {checked} journeys: {drifted} drifted, {repaired} repaired, "
+            f"{mismatched} with booking mismatches"
+        )
+        if drifted > repaired:
+            raise CommandError("Availability counters have drifted; rerun with --repair")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from journey.services import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Release seats held by PENDING bookings whose hold has expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        released = release_expired_holds(batch_size=options['batch_size'])
+        self.stdout.write(f"Released {released} expired holds")
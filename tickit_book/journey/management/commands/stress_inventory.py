@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from journey.models import Journey
+from journey.services import reserve_seats, InsufficientSeats
+
+
+class Command(BaseCommand):
+    help = "Hammer a single journey with concurrent seat reservations and check for oversells"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seats', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--attempts', type=int, default=2000,
+                            help="Total reservation attempts; should exceed --seats")
+
+    def handle(self, *args, **options):
+        seats = options['seats']
+        attempts = options['attempts']
+        departure = timezone.now() + timedelta(days=1)
+        journey = Journey.objects.create(
+            source='Stress',
+            destination='Test',
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=1),
+            transport_name='Stress',
+            transport_number='STRESS',
+            total_seats=seats,
+            available_seats=seats,
+            price=0
+        )
+
+        def attempt(_):
+            try:
+                reserve_seats(journey.pk, 1)
+                return True
+            except InsufficientSeats:
+                return False
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                succeeded = sum(pool.map(attempt, range(attempts)))
+            elapsed = time.perf_counter() - started
+
+            journey.refresh_from_db()
+            self.stdout.write(
+                f"{attempts} attempts in {elapsed:.2f}s ({attempts / elapsed:.0f}/s): "
+                f"{succeeded} reserved, {journey.available_seats} left"
+            )
+            expected = min(seats, attempts)
+            if succeeded != expected or journey.available_seats != seats - succeeded:
+                raise CommandError("Inventory mismatch: seats were oversold or updates were lost")
+            self.stdout.write(self.style.SUCCESS("No oversells or lost updates"))
+        finally:
+            journey.delete()
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:13
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def normalize_place(name):
+    return ' '.join(name.split()).casefold()
+
+
+def backfill_stations(apps, schema_editor):
+    Journey = apps.get_model('journey', 'Journey')
+    Station = apps.get_model('journey', 'Station')
+
+    stations = {}
+    for name in set(Journey.objects.values_list('source', flat=True)) | set(
+        Journey.objects.values_list('destination', flat=True)
+    ):
+        key = normalize_place(name)
+        if key not in stations:
+            stations[key] = Station.objects.create(name=' '.join(name.split()), search_name=key)
+
+    batch = []
+    for journey in Journey.objects.only('id', 'source', 'destination').iterator(chunk_size=2000):
+        journey.source_station = stations[normalize_place(journey.source)]
+        journey.destination_station = stations[normalize_place(journey.destination)]
+        batch.append(journey)
+        if len(batch) == 2000:
+            Journey.objects.bulk_update(batch, ['source_station', 'destination_station'])
+            batch = []
+    Journey.objects.bulk_update(batch, ['source_station', 'destination_station'])
+
+
+def create_trigram_index(apps, schema_editor):
+    # gin_trgm_ops serves both prefix (LIKE 'x%') and similarity lookups on
+    # PostgreSQL; other backends fall back to the unique btree on search_name.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX journey_station_search_trgm ON journey_station '
+            'USING gin (search_name gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS journey_station_search_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journey', '0002_booking_hold_expiry'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='Station',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('search_name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='journey',
+            name='destination_station',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='arrivals', to='journey.station'),
+        ),
+        migrations.AddField(
+            model_name='journey',
+            name='source_station',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='departures', to='journey.station'),
+        ),
+        migrations.AddIndex(
+            model_name='journey',
+            index=models.Index(fields=['source_station', 'destination_station', 'departure_time'], name='journey_jou_source__4800db_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journey',
+            index=models.Index(fields=['destination_station', 'departure_time'], name='journey_jou_destina_cd5e6f_idx'),
+        ),
+        migrations.RunPython(backfill_stations, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journey', '0003_station_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-booking_time', '-id'], name='journey_boo_user_id_584418_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journey',
+            index=models.Index(fields=['departure_time', 'id'], name='journey_jou_departu_8e633e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-payment_time', '-id'], name='journey_pay_payment_47c791_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:18
+
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    # Must match journey.references.SEQUENCE_NAME and BLOCK_SIZE
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE SEQUENCE journey_booking_reference_seq INCREMENT BY 1000 MINVALUE 0 START WITH 0'
+        )
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE IF EXISTS journey_booking_reference_seq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journey', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceBlock',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_start', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_seat_classes(apps, schema_editor):
+    Seat = apps.get_model('journey', 'Seat')
+    SeatClassAvailability = apps.get_model('journey', 'SeatClassAvailability')
+
+    rows = (
+        Seat.objects.values('journey_id', 'seat_class')
+        .annotate(total=Count('id'), free=Count('id', filter=Q(is_booked=False)))
+        .order_by()
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        batch.append(SeatClassAvailability(
+            journey_id=row['journey_id'],
+            seat_class=row['seat_class'],
+            total_seats=row['total'],
+            available_seats=row['free'],
+        ))
+        if len(batch) == 2000:
+            SeatClassAvailability.objects.bulk_create(batch)
+            batch = []
+    SeatClassAvailability.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journey', '0007_payment_processing_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatClassAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seat_class', models.CharField(max_length=20)),
+                ('total_seats', models.PositiveIntegerField()),
+                ('available_seats', models.PositiveIntegerField()),
+                ('journey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_classes', to='journey.journey')),
+            ],
+            options={
+                'verbose_name_plural': 'Seat class availability',
+                'ordering': ['journey', 'seat_class'],
+                'constraints': [models.UniqueConstraint(fields=('journey', 'seat_class'), name='unique_journey_seat_class'), models.CheckConstraint(condition=models.Q(('available_seats__lte', models.F('total_seats'))), name='class_available_seats_lte_total')],
+            },
+        ),
+        migrations.RunPython(backfill_seat_classes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journey', '0008_seat_class_availability'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['booking_time', 'id'], name='journey_boo_booking_fff899_idx'),
+        ),
+    ]
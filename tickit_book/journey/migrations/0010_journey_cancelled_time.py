@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journey', '0009_booking_export_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journey',
+            name='cancelled_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journey', '0010_journey_cancelled_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,77 @@
+"""
+Give journeys created before seat allocation their Seat rows.
+
+book_journey allocates Seat rows and decrements the per-class counters,
+so a journey without them cannot be booked at all. For every such journey
+this creates total_seats Standard seats, numbered the way
+Journey.seat_layout() numbers them. Each live booking is then handed
+seat_count of them, in booking order, and a SeatClassAvailability
+counter is created from the result.
+
+available_seats on the journey is not touched. Run `manage.py
+reconcile_availability` afterwards to find journeys where it disagrees
+with the bookings; `--repair` brings it in line with the seats.
+"""
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+SEAT_CLASS = 'Standard'
+
+
+def backfill_seats(apps, schema_editor):
+    Journey = apps.get_model('journey', 'Journey')
+    Booking = apps.get_model('journey', 'Booking')
+    Seat = apps.get_model('journey', 'Seat')
+    SeatClassAvailability = apps.get_model('journey', 'SeatClassAvailability')
+
+    seatless = Journey.objects.filter(seats__isnull=True).order_by('pk')
+    last_id = 0
+    while True:
+        journeys = list(
+            seatless.filter(pk__gt=last_id).values_list('pk', 'total_seats')[:BATCH_SIZE]
+        )
+        if not journeys:
+            return
+        last_id = journeys[-1][0]
+        journey_ids = [pk for pk, _ in journeys]
+
+        owners = {pk: [] for pk in journey_ids}  # journey -> booking id per booked seat
+        for journey_id, booking_id, seat_count in (
+            Booking.objects.filter(journey_id__in=journey_ids).exclude(status='CANCELLED')
+            .order_by('booking_time', 'id').values_list('journey_id', 'id', 'seat_count')
+        ):
+            owners[journey_id].extend([booking_id] * seat_count)
+
+        seats, counters = [], []
+        for journey_id, total_seats in journeys:
+            booked = owners[journey_id][:total_seats]
+            width = len(str(total_seats))
+            for number in range(1, total_seats + 1):
+                booking_id = booked[number - 1] if number <= len(booked) else None
+                seats.append(Seat(
+                    journey_id=journey_id,
+                    seat_number=str(number).zfill(width),
+                    seat_class=SEAT_CLASS,
+                    is_booked=booking_id is not None,
+                    booking_id=booking_id,
+                ))
+            free = total_seats - len(booked)
+            counters.append(SeatClassAvailability(
+                journey_id=journey_id, seat_class=SEAT_CLASS, total_seats=total_seats, available_seats=free
+            ))
+
+        SeatClassAvailability.objects.filter(journey_id__in=journey_ids).delete()
+        Seat.objects.bulk_create(seats, batch_size=2000)
+        SeatClassAvailability.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journey', '0011_payment_claimed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_seats, migrations.RunPython.noop),
+    ]
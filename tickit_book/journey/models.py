@@ -1,8 +1,33 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 
+
+def normalize_place(name):
+    return ' '.join(name.split()).casefold()
+
+
+class Station(models.Model):
+    name = models.CharField(max_length=100)
+    search_name = models.CharField(max_length=100, unique=True)  # normalized form of name
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def for_name(cls, name):
+        station, _ = cls.objects.get_or_create(
+            search_name=normalize_place(name),
+            defaults={'name': ' '.join(name.split())}
+        )
+        return station
+
+
 class Journey(models.Model):
     class TransportType(models.TextChoices):
         BUS = 'BUS', 'Bus'
@@ -12,6 +37,12 @@ class Journey(models.Model):
 
     source = models.CharField(max_length=100)
     destination = models.CharField(max_length=100)
+    source_station = models.ForeignKey(
+        Station, on_delete=models.PROTECT, null=True, blank=True, related_name='departures'
+    )
+    destination_station = models.ForeignKey(
+        Station, on_delete=models.PROTECT, null=True, blank=True, related_name='arrivals'
+    )
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
     transport_type = models.CharField(
@@ -24,12 +55,18 @@ class Journey(models.Model):
     total_seats = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     available_seats = models.PositiveIntegerField(validators=[MinValueValidator(0)])
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    cancelled_time = models.DateTimeField(null=True, blank=True)  # set when the operator cancels it
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['departure_time']
         verbose_name_plural = "Journeys"
+        indexes = [
+            models.Index(fields=['source_station', 'destination_station', 'departure_time']),
+            models.Index(fields=['destination_station', 'departure_time']),
+            models.Index(fields=['departure_time', 'id']),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=models.Q(departure_time__lt=models.F('arrival_time')),
@@ -44,12 +81,60 @@ class Journey(models.Model):
     def __str__(self):
         return f"{self.transport_type} {self.transport_number} from {self.source} to {self.destination}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        journey = super().from_db(db, field_names, values)
+        # The names the stations were resolved from, so saves that leave
+        # them alone skip the station lookups.
+        journey._saved_places = {
+            name: value for name, value in zip(field_names, values) if name in ('source', 'destination')
+        }
+        return journey
+
+    def save(self, *args, **kwargs):
+        # Remembered so cache invalidation can also cover the old route.
+        self._previous_station_ids = (self.source_station_id, self.destination_station_id)
+        update_fields = kwargs.get('update_fields')
+        saved = getattr(self, '_saved_places', {})
+        resolved = []
+        for place, station in (('source', 'source_station'), ('destination', 'destination_station')):
+            if update_fields is not None and place not in update_fields:
+                continue
+            if getattr(self, place) != saved.get(place) or getattr(self, f'{station}_id') is None:
+                setattr(self, station, Station.for_name(getattr(self, place)))
+                resolved.append(station)
+        if update_fields is not None and resolved:
+            kwargs['update_fields'] = [*update_fields, *resolved]
+        super().save(*args, **kwargs)
+        self._saved_places = {'source': self.source, 'destination': self.destination}
+
     def is_upcoming(self):
         return self.departure_time > timezone.now()
 
     def duration(self):
         return self.arrival_time - self.departure_time
 
+    def seat_layout(self, seat_classes=None):
+        """Yield (seat_number, seat_class) pairs for this journey's seats.
+
+        seat_classes is a list of (seat_class, count) pairs filled in order;
+        by default every seat is Standard. Seat numbers are zero-padded so
+        their string ordering matches the numeric one.
+        """
+        seat_classes = seat_classes or [('Standard', self.total_seats)]
+        width = len(str(self.total_seats))
+        number = 0
+        for seat_class, count in seat_classes:
+            for _ in range(count):
+                number += 1
+                yield str(number).zfill(width), seat_class
+
+    def build_seats(self, seat_classes=None):
+        return [
+            Seat(journey=self, seat_number=seat_number, seat_class=seat_class)
+            for seat_number, seat_class in self.seat_layout(seat_classes)
+        ]
+
 
 class Booking(models.Model):
     class BookingStatus(models.TextChoices):
@@ -69,6 +154,7 @@ class Booking(models.Model):
     )
     booking_time = models.DateTimeField(auto_now_add=True)
     cancelled_time = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)  # set while a PENDING hold is live
     notes = models.TextField(blank=True, null=True)
 
     class Meta:
@@ -76,6 +162,9 @@ class Booking(models.Model):
         indexes = [
             models.Index(fields=['booking_reference']),
             models.Index(fields=['user', 'status']),
+            models.Index(fields=['status', 'expires_at']),
+            models.Index(fields=['user', '-booking_time', '-id']),
+            models.Index(fields=['booking_time', 'id']),
         ]
 
     def __str__(self):
@@ -89,17 +178,26 @@ class Booking(models.Model):
         super().save(*args, **kwargs)
 
     def generate_booking_reference(self):
-        import random
-        import string
-        return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+        from .references import next_booking_reference
+        return next_booking_reference()
 
     def cancel(self):
-        if self.status != self.BookingStatus.CANCELLED:
-            self.status = self.BookingStatus.CANCELLED
-            self.cancelled_time = timezone.now()
-            self.journey.available_seats += self.seat_count
-            self.journey.save()
-            self.save()
+        from .services import cancel_booking
+        return cancel_booking(self)
+
+    def is_payable(self):
+        if self.status == self.BookingStatus.PENDING:
+            return self.expires_at is None or self.expires_at > timezone.now()
+        return self.status == self.BookingStatus.CONFIRMED
+
+
+class ReferenceBlock(models.Model):
+    # Block counter for journey.references on databases without sequences
+    name = models.CharField(max_length=50, primary_key=True)
+    next_start = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} at {self.next_start}"
 
 
 class Seat(models.Model):
@@ -123,9 +221,37 @@ class Seat(models.Model):
         return f"Seat {self.seat_number} on {self.journey}"
 
 
+class SeatClassAvailability(models.Model):
+    """Free-seat counter per (journey, seat class), kept in step with Seat.
+
+    Updated in the same transaction as every seat claim and release, so
+    class-level availability is a single-row lookup; the
+    reconcile_availability command recomputes it from Seat.
+    """
+    journey = models.ForeignKey(Journey, on_delete=models.CASCADE, related_name='seat_classes')
+    seat_class = models.CharField(max_length=20)
+    total_seats = models.PositiveIntegerField()
+    available_seats = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['journey', 'seat_class']
+        verbose_name_plural = "Seat class availability"
+        constraints = [
+            models.UniqueConstraint(fields=['journey', 'seat_class'], name='unique_journey_seat_class'),
+            models.CheckConstraint(
+                check=models.Q(available_seats__lte=models.F('total_seats')),
+                name='class_available_seats_lte_total'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.seat_class} on {self.journey}: {self.available_seats}/{self.total_seats}"
+
+
 class Payment(models.Model):
     class PaymentStatus(models.TextChoices):
         PENDING = 'PENDING', 'Pending'
+        PROCESSING = 'PROCESSING', 'Processing'
         COMPLETED = 'COMPLETED', 'Completed'
         FAILED = 'FAILED', 'Failed'
         REFUNDED = 'REFUNDED', 'Refunded'
@@ -144,7 +270,35 @@ class Payment(models.Model):
         default=PaymentStatus.PENDING
     )
     payment_time = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # when a worker started charging it
     payment_details = models.JSONField(default=dict)  # Store additional payment info
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-payment_time', '-id']),
+        ]
+
+    def __str__(self):
+        return f"Payment {self.transaction_id} for {self.booking}"
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    endpoint = models.CharField(max_length=100)  # URL name, e.g. "booking-list-create"
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)  # null while in flight
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()  # end of the lease while in flight
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'endpoint', 'key'], name='unique_idempotency_key')
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
     def __str__(self):
-        return f"Payment {self.transaction_id} for {self.booking}"
\ No newline at end of file
+        return f"{self.endpoint} {self.key}"
@@ -0,0 +1,56 @@
+from functools import lru_cache
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def optimize_queryset(queryset, serializer_class):
+    """Apply the select_related/prefetch_related calls serializer_class needs."""
+    select, prefetch = related_lookups(serializer_class, queryset.model)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+@lru_cache(maxsize=None)
+def related_lookups(serializer_class, model):
+    select, prefetch = [], []
+    _collect(serializer_class(), model, '', False, select, prefetch)
+    return tuple(select), tuple(prefetch)
+
+
+def _collect(serializer, model, prefix, in_prefetch, select, prefetch):
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        # Method fields are assumed to read the relation they are named after,
+        # e.g. BookingSerializer.get_payment reads booking.payment.
+        if isinstance(field, serializers.SerializerMethodField):
+            name = field.field_name
+        elif len(field.source_attrs) == 1:
+            name = field.source
+        else:
+            continue
+
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+
+        if isinstance(field, serializers.RelatedField) and field.use_pk_only_optimization():
+            continue
+
+        lookup = prefix + name
+        to_many = model_field.one_to_many or model_field.many_to_many
+        if to_many or in_prefetch:
+            prefetch.append(lookup)
+        else:
+            select.append(lookup)
+
+        child = field.child if isinstance(field, serializers.ListSerializer) else field
+        if isinstance(child, serializers.BaseSerializer):
+            _collect(child, model_field.related_model, lookup + '__', in_prefetch or to_many, select, prefetch)
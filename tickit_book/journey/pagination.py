@@ -0,0 +1,28 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    # Cursor pagination seeks on the leading ordering column, so every page
+    # costs an index range scan instead of an ever-growing OFFSET. The
+    # trailing 'id' keeps the order total when the leading column has ties.
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class JourneyPagination(KeysetPagination):
+    ordering = ('departure_time', 'id')
+
+
+class BookingPagination(KeysetPagination):
+    ordering = ('-booking_time', '-id')
+
+
+class PaymentPagination(KeysetPagination):
+    ordering = ('-payment_time', '-id')
+
+
+class SeatPagination(KeysetPagination):
+    ordering = ('seat_number', 'id')
+    page_size = 200
+    max_page_size = 1000
@@ -0,0 +1,114 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from tickit_book.forking import reset_after_fork
+from .gateways import get_gateway
+from .models import Booking, Payment
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PAYMENT_WORKERS,
+                thread_name_prefix='payments'
+            )
+        return _executor
+
+
+# A forked worker gets a fresh pool; the parent's threads do not survive fork.
+@reset_after_fork
+def _reset_executor():
+    global _executor
+    _executor = None
+
+
+def enqueue_payment(payment_id):
+    """Charge the payment in the background once the current transaction commits."""
+    transaction.on_commit(lambda: _get_executor().submit(_run, payment_id))
+
+
+def _run(payment_id):
+    try:
+        process_payment(payment_id)
+    except Exception:
+        logger.exception("Processing payment %s failed", payment_id)
+    finally:
+        close_old_connections()
+
+
+def claimable(now=None):
+    """Payments waiting to be charged, including claims abandoned by a dead worker."""
+    stale = (now or timezone.now()) - timedelta(seconds=settings.PAYMENT_CLAIM_TIMEOUT)
+    return Q(status=Payment.PaymentStatus.PENDING) | Q(
+        Q(claimed_at__lt=stale) | Q(claimed_at__isnull=True),
+        status=Payment.PaymentStatus.PROCESSING
+    )
+
+
+def _finish(payment, status, **details):
+    payment.status = status
+    payment.payment_details = {**payment.payment_details, **details}
+    payment.save(update_fields=['status', 'payment_details'])
+    return payment
+
+
+def process_payment(payment_id):
+    # Claim the payment first so a second worker (or the process_payments
+    # command) never charges it twice; no transaction is held open while the
+    # gateway call is in flight. A claim older than PAYMENT_CLAIM_TIMEOUT is
+    # taken over: gateways dedupe charges on transaction_id, so a retry after
+    # a worker died mid-charge cannot bill the customer twice.
+    now = timezone.now()
+    claimed = Payment.objects.filter(claimable(now), pk=payment_id).update(
+        status=Payment.PaymentStatus.PROCESSING,
+        claimed_at=now
+    )
+    if not claimed:
+        return None
+
+    payment = Payment.objects.select_related('booking').get(pk=payment_id)
+    if not payment.booking.is_payable():
+        return _finish(payment, Payment.PaymentStatus.FAILED, failure='Booking was cancelled or its hold expired')
+
+    result = get_gateway().charge(payment)
+    if not result.success:
+        return _finish(payment, Payment.PaymentStatus.FAILED, failure=result.message)
+
+    with transaction.atomic():
+        # The booking may have been cancelled, or its hold released, while the
+        # charge was in flight. Locking it settles the race: the hold sweeper
+        # skips locked rows, and a cancel waits for us and then sees it paid.
+        booking = Booking.objects.select_for_update().get(pk=payment.booking_id)
+        if booking.status == Booking.BookingStatus.PENDING:
+            # A paid hold becomes a confirmed booking; its seats are still held
+            # even if it expired a moment ago, since the sweeper has not run.
+            booking.status = Booking.BookingStatus.CONFIRMED
+            booking.expires_at = None
+            booking.save(update_fields=['status', 'expires_at'])
+        _finish(payment, Payment.PaymentStatus.COMPLETED, gateway_reference=result.reference)
+
+    if booking.status == Booking.BookingStatus.CANCELLED:
+        _refund(payment)
+    return payment
+
+
+def _refund(payment):
+    result = get_gateway().refund(payment)
+    if result.success:
+        return _finish(payment, Payment.PaymentStatus.REFUNDED, refund_reference=result.reference)
+    # Left COMPLETED and flagged for someone to refund by hand.
+    logger.error("Refunding payment %s for cancelled booking %s failed: %s",
+                 payment.pk, payment.booking_id, result.message)
+    return _finish(payment, Payment.PaymentStatus.COMPLETED, refund_failed=result.message)
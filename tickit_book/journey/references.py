@@ -0,0 +1,114 @@
+import threading
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from tickit_book.forking import reset_after_fork
+
+# Booking references are drawn from blocks of a global counter: each process
+# reserves BLOCK_SIZE values with one database round trip and hands them out
+# from memory, so references are unique by construction and never need a
+# retry on the unique constraint. The counter value is scrambled with a
+# bijection on 40 bits (so references do not look sequential) and encoded as
+# 8 Crockford base32 characters plus a Luhn mod 32 check character.
+#
+# BLOCK_SIZE is baked into the PostgreSQL sequence created by migration 0005
+# and must not change.
+BLOCK_SIZE = 1000
+SEQUENCE_NAME = 'journey_booking_reference_seq'
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+BITS = 40
+MASK = (1 << BITS) - 1
+MULTIPLIER = 0x9E3779B97F & MASK | 1  # odd, hence invertible mod 2**40
+OFFSET = 0x5DEECE66D & MASK
+INVERSE = pow(MULTIPLIER, -1, 1 << BITS)
+LENGTH = BITS // 5
+DIGITS = {char: index for index, char in enumerate(ALPHABET)}
+
+
+def _check_character(body):
+    # Luhn mod N over the base32 alphabet: catches every single-character
+    # error and most adjacent transpositions.
+    factor, total = 2, 0
+    for char in reversed(body):
+        addend = factor * DIGITS[char]
+        total += addend // 32 + addend % 32
+        factor = 1 if factor == 2 else 2
+    return ALPHABET[(32 - total % 32) % 32]
+
+
+def encode(value):
+    scrambled = (value * MULTIPLIER + OFFSET) & MASK
+    body = ''.join(ALPHABET[(scrambled >> shift) & 31] for shift in range(BITS - 5, -1, -5))
+    return body + _check_character(body)
+
+
+def decode(reference):
+    """Return the counter value behind a reference, or None if it is invalid."""
+    reference = reference.upper()
+    if len(reference) != LENGTH + 1 or any(char not in DIGITS for char in reference):
+        return None
+    body = reference[:LENGTH]
+    if _check_character(body) != reference[-1]:
+        return None
+    scrambled = 0
+    for char in body:
+        scrambled = scrambled << 5 | DIGITS[char]
+    return ((scrambled - OFFSET) * INVERSE) & MASK
+
+
+def _reserve_block(minimum=0):
+    if connection.vendor == 'postgresql':
+        # nextval is not transactional, so a block stays reserved even if the
+        # booking that triggered the allocation is rolled back.
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [SEQUENCE_NAME])
+            return cursor.fetchone()[0]
+
+    # Portable fallback for SQLite and friends. Unlike a sequence the counter
+    # update is undone if an enclosing transaction rolls back, so the caller
+    # passes the highest value it has handed out and the counter is moved past
+    # it. That keeps a single process collision-free; use PostgreSQL for
+    # multi-process deployments.
+    from .models import ReferenceBlock
+
+    with transaction.atomic():
+        # Write first so the row lock is taken up front rather than upgraded.
+        updated = ReferenceBlock.objects.filter(pk=SEQUENCE_NAME).update(
+            next_start=Greatest(F('next_start'), Value(minimum)) + BLOCK_SIZE
+        )
+        if not updated:
+            ReferenceBlock.objects.create(pk=SEQUENCE_NAME, next_start=minimum + BLOCK_SIZE)
+        return ReferenceBlock.objects.get(pk=SEQUENCE_NAME).next_start - BLOCK_SIZE
+
+
+class ReferenceAllocator:
+    def __init__(self, reserve_block=_reserve_block):
+        self._reserve_block = reserve_block
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._next = self._end = 0
+
+    def next_value(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._reserve_block(self._end)
+                self._end = self._next + BLOCK_SIZE
+            value = self._next
+            self._next += 1
+            return value
+
+    def next_reference(self):
+        return encode(self.next_value())
+
+
+allocator = ReferenceAllocator()
+
+# A forked worker must not keep handing out the parent's block.
+reset_after_fork(allocator.reset)
+
+
+def next_booking_reference():
+    return allocator.next_reference()
@@ -0,0 +1,26 @@
+from django.db import connection
+from django.db.models import Q
+from .models import Station, normalize_place
+
+# Below this length trigram similarity matches almost everything.
+MIN_FUZZY_LENGTH = 3
+
+
+def matching_stations(term):
+    key = normalize_place(term)
+    condition = Q(search_name__startswith=key)
+    if connection.vendor == 'postgresql' and len(key) >= MIN_FUZZY_LENGTH:
+        condition |= Q(search_name__trigram_similar=key)
+    return Station.objects.filter(condition).values('pk')
+
+
+def search_journeys(queryset, source=None, destination=None):
+    queryset = queryset.filter(cancelled_time__isnull=True)
+    # Resolve the (small) station dimension first so the Journey scan is a
+    # range over the (source_station, destination_station, departure_time)
+    # index instead of a substring match over every row.
+    if source:
+        queryset = queryset.filter(source_station__in=matching_stations(source))
+    if destination:
+        queryset = queryset.filter(destination_station__in=matching_stations(destination))
+    return queryset
@@ -0,0 +1,78 @@
+import base64
+from itertools import groupby
+from django.http import Http404
+from .models import Journey, Seat
+
+
+def encode_bitset(flags):
+    bits = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            bits[index // 8] |= 0x80 >> (index % 8)
+    return base64.b64encode(bytes(bits)).decode()
+
+
+def encode_ranges(seat_numbers):
+    """Run-length encode seat numbers as [first, count] pairs.
+
+    A run covers consecutive numeric seat numbers of the same width, so
+    ['01', '02', '03', '07'] becomes [['01', 3], ['07', 1]]. Any other seat
+    number is a run of its own.
+    """
+    runs = []
+    previous = None
+    for number in seat_numbers:
+        if (
+            previous is not None and number.isdecimal() and previous.isdecimal()
+            and len(number) == len(previous) and int(number) == int(previous) + 1
+        ):
+            runs[-1][1] += 1
+        else:
+            runs.append([number, 1])
+        previous = number
+    return runs
+
+
+def _seat_rows(journey_id):
+    # One ordered scan over the journey's seats
+    return (
+        Seat.objects.filter(journey_id=journey_id)
+        .order_by('seat_class', 'seat_number')
+        .values_list('seat_class', 'seat_number', 'is_booked')
+    )
+
+
+def build_seat_map(journey_id):
+    rows = list(_seat_rows(journey_id))
+    if not rows and not Journey.objects.filter(pk=journey_id).exists():
+        raise Http404
+    return _assemble(journey_id, rows)
+
+
+async def abuild_seat_map(journey_id):
+    rows = [row async for row in _seat_rows(journey_id)]
+    if not rows and not await Journey.objects.filter(pk=journey_id).aexists():
+        raise Http404
+    return _assemble(journey_id, rows)
+
+
+def _assemble(journey_id, rows):
+    # Bit i of a class's "booked" bitset (most significant bit first)
+    # describes its i-th seat, counting through seat_ranges in order. Seats
+    # are laid out in numbered runs, so the numbering stays a few pairs per
+    # class however large the journey is.
+    classes = {}
+    for seat_class, seats in groupby(rows, key=lambda row: row[0]):
+        seats = list(seats)
+        booked = [is_booked for _, _, is_booked in seats]
+        classes[seat_class] = {
+            'seat_ranges': encode_ranges([seat_number for _, seat_number, _ in seats]),
+            'booked': encode_bitset(booked),
+            'available': booked.count(False),
+        }
+
+    return {
+        'journey': journey_id,
+        'available': sum(seat_class['available'] for seat_class in classes.values()),
+        'classes': classes,
+    }
@@ -1,28 +1,52 @@
 from rest_framework import serializers
 from .models import Journey, Booking, Seat, Payment
+from .availability import create_seat_classes
 from authentication.serializers import UserSerializer
+from tickit_book.metrics import TimedSerializerMixin
+from django.db import transaction
 from django.utils import timezone
 
-class JourneySerializer(serializers.ModelSerializer):
+def check_journey_rules(departure_time, arrival_time, total_seats, available_seats):
+    # Python mirror of the departure_before_arrival and available_seats_lte_total
+    # constraints on Journey, shared with the bulk importer.
+    if departure_time >= arrival_time:
+        raise serializers.ValidationError("Arrival time must be after departure time")
+    if available_seats > total_seats:
+        raise serializers.ValidationError("Available seats cannot exceed total seats")
+
+class JourneySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Journey
         fields = '__all__'
-        read_only_fields = ('available_seats', 'created_at', 'updated_at')
+        read_only_fields = (
+            'available_seats', 'source_station', 'destination_station', 'cancelled_time',
+            'created_at', 'updated_at'
+        )
 
     def validate(self, data):
-        if data['departure_time'] >= data['arrival_time']:
-            raise serializers.ValidationError("Arrival time must be after departure time")
-        if data['available_seats'] > data['total_seats']:
-            raise serializers.ValidationError("Available seats cannot exceed total seats")
+        def value(field):
+            return data[field] if field in data else getattr(self.instance, field, None)
+
+        total_seats = value('total_seats')
+        available_seats = self.instance.available_seats if self.instance else total_seats
+        check_journey_rules(value('departure_time'), value('arrival_time'), total_seats, available_seats)
         return data
 
-class SeatSerializer(serializers.ModelSerializer):
+    def create(self, validated_data):
+        # A journey without its seats or counters cannot be booked.
+        with transaction.atomic():
+            journey = Journey.objects.create(available_seats=validated_data['total_seats'], **validated_data)
+            Seat.objects.bulk_create(journey.build_seats())
+            create_seat_classes([(journey, None)])
+        return journey
+
+class SeatSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Seat
         fields = '__all__'
         read_only_fields = ('is_booked', 'booking')
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     journey = JourneySerializer(read_only=True)
     seats = SeatSerializer(many=True, read_only=True)
@@ -31,23 +55,30 @@ class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = '__all__'
-        read_only_fields = ('booking_reference', 'total_price', 'booking_time', 'cancelled_time')
+        # Seats, status and the hold expiry only change through the booking
+        # services: confirm, pay or cancel (DELETE), never a plain update.
+        read_only_fields = (
+            'booking_reference', 'seat_count', 'total_price', 'status',
+            'booking_time', 'cancelled_time', 'expires_at',
+        )
 
     def get_payment(self, obj):
         if hasattr(obj, 'payment'):
             return PaymentSerializer(obj.payment).data
         return None
 
-class CreateBookingSerializer(serializers.ModelSerializer):
+class CreateBookingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     seat_numbers = serializers.ListField(
         child=serializers.CharField(max_length=10),
         write_only=True,
         required=False
     )
+    seat_class = serializers.CharField(max_length=20, write_only=True, required=False)
+    hold = serializers.BooleanField(write_only=True, required=False, default=False)
 
     class Meta:
         model = Booking
-        fields = ['journey', 'seat_count', 'seat_numbers', 'notes']
+        fields = ['journey', 'seat_count', 'seat_numbers', 'seat_class', 'notes', 'hold']
         extra_kwargs = {
             'journey': {'required': True},
             'seat_count': {'required': True}
@@ -60,31 +91,34 @@ class CreateBookingSerializer(serializers.ModelSerializer):
         if journey.departure_time < timezone.now():
             raise serializers.ValidationError("Cannot book a journey that has already departed")
 
+        if journey.cancelled_time is not None:
+            raise serializers.ValidationError("Cannot book a journey that has been cancelled")
+
         if journey.available_seats < seat_count:
             raise serializers.ValidationError("Not enough seats available")
 
+        if 'seat_numbers' in data and 'seat_class' in data:
+            raise serializers.ValidationError("Specify either seat numbers or a seat class, not both")
+
         if 'seat_numbers' in data:
             if len(data['seat_numbers']) != seat_count:
                 raise serializers.ValidationError("Number of seat numbers must match seat count")
 
-            unavailable_seats = Seat.objects.filter(
-                journey=journey,
-                seat_number__in=data['seat_numbers'],
-                is_booked=True
-            ).exists()
+            if len(set(data['seat_numbers'])) != len(data['seat_numbers']):
+                raise serializers.ValidationError("Seat numbers must be unique")
 
-            if unavailable_seats:
-                raise serializers.ValidationError("One or more selected seats are already booked")
+            # Seat availability is decided atomically by the claim in
+            # journey.services.claim_seats, not by a racy pre-check here.
 
         return data
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = '__all__'
         read_only_fields = ('payment_time',)
 
-class CreatePaymentSerializer(serializers.ModelSerializer):
+class CreatePaymentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['amount', 'payment_method', 'payment_details']
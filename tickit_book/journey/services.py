@@ -0,0 +1,254 @@
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When
+from django.utils import timezone
+from .cache import invalidate_availability, invalidate_seat_map
+from .models import Journey, Booking, Seat, SeatClassAvailability
+from .signals import bookings_changed
+
+
+class InsufficientSeats(Exception):
+    pass
+
+
+class SeatUnavailable(Exception):
+    pass
+
+
+class HoldExpired(Exception):
+    pass
+
+
+class JourneyCancelled(Exception):
+    pass
+
+
+def reserve_seats(journey_id, seat_count):
+    # A single conditional UPDATE: the row lock is held only for the duration
+    # of the statement, and the WHERE clause makes oversells impossible. It
+    # also serializes against cancel_journey_bookings, so a booking cannot
+    # slip in after the journey is cancelled.
+    updated = Journey.objects.filter(
+        pk=journey_id,
+        cancelled_time__isnull=True,
+        available_seats__gte=seat_count
+    ).update(available_seats=F('available_seats') - seat_count)
+    if not updated:
+        if Journey.objects.filter(pk=journey_id, cancelled_time__isnull=False).exists():
+            raise JourneyCancelled("Journey has been cancelled")
+        raise InsufficientSeats("Not enough seats available")
+    invalidate_availability([journey_id])
+
+
+def release_seats(journey_id, seat_count):
+    Journey.objects.filter(pk=journey_id).update(
+        available_seats=F('available_seats') + seat_count
+    )
+    invalidate_availability([journey_id])
+
+
+def reserve_seat_classes(journey_id, class_counts):
+    # Same conditional UPDATE as reserve_seats, one per class. Classes are
+    # taken in a fixed order so concurrent bookings lock rows consistently.
+    for seat_class in sorted(class_counts):
+        seat_count = class_counts[seat_class]
+        updated = SeatClassAvailability.objects.filter(
+            journey_id=journey_id,
+            seat_class=seat_class,
+            available_seats__gte=seat_count
+        ).update(available_seats=F('available_seats') - seat_count)
+        if not updated:
+            raise InsufficientSeats(f"Not enough {seat_class} seats available")
+
+
+def claim_seats(journey_id, booking, seat_numbers):
+    """Claim the given seats for booking; returns a Counter of seat classes."""
+    # One set-based UPDATE for the whole group; the affected-row count tells us
+    # whether every requested seat was still free.
+    seat_numbers = set(seat_numbers)
+    claimed = Seat.objects.filter(
+        journey_id=journey_id,
+        seat_number__in=seat_numbers,
+        is_booked=False
+    ).update(is_booked=True, booking=booking)
+    if claimed != len(seat_numbers):
+        raise SeatUnavailable("One or more selected seats are already booked")
+    invalidate_seat_map([journey_id])
+    return Counter(dict(
+        Seat.objects.filter(booking=booking).values('seat_class')
+        .annotate(n=Count('id')).order_by().values_list('seat_class', 'n')
+    ))
+
+
+def allocate_seats(journey_id, booking, seat_count, seat_class=None):
+    """Assign the lowest-numbered free seats; returns a Counter of seat classes."""
+    free = Seat.objects.filter(journey_id=journey_id, is_booked=False)
+    if seat_class:
+        free = free.filter(seat_class=seat_class)
+    # skip_locked lets concurrent allocations pass over each other's picks
+    # instead of queueing behind them.
+    seats = list(
+        free.select_for_update(skip_locked=True)
+        .order_by('seat_number')
+        .values_list('id', 'seat_class')[:seat_count]
+    )
+    if len(seats) < seat_count:
+        raise InsufficientSeats("Not enough seats available")
+    Seat.objects.filter(pk__in=[pk for pk, _ in seats]).update(is_booked=True, booking=booking)
+    invalidate_seat_map([journey_id])
+    return Counter(seat_class for _, seat_class in seats)
+
+
+def book_journey(user_id, journey, seat_count, seat_numbers=None, seat_class=None, notes='', hold=False):
+    # A hold takes the seats exactly like a booking does, but stays PENDING
+    # until confirmed and is released by release_expired_holds after the TTL.
+    # Without seat_numbers the booking is given free seats (of seat_class,
+    # if set), so every live booking owns exactly seat_count Seat rows.
+    extra = {}
+    if hold:
+        extra = {
+            'status': Booking.BookingStatus.PENDING,
+            'expires_at': timezone.now() + timedelta(seconds=settings.BOOKING_HOLD_TTL)
+        }
+
+    with transaction.atomic():
+        booking = Booking.objects.create(
+            user_id=user_id,
+            journey=journey,
+            seat_count=seat_count,
+            total_price=journey.price * seat_count,
+            notes=notes,
+            **extra
+        )
+
+        if seat_numbers:
+            class_counts = claim_seats(journey.pk, booking, seat_numbers)
+        else:
+            class_counts = allocate_seats(journey.pk, booking, seat_count, seat_class)
+        reserve_seat_classes(journey.pk, class_counts)
+
+        # Decrement the journey row last so its lock is held for as short a
+        # time as possible before commit.
+        reserve_seats(journey.pk, seat_count)
+
+    return booking
+
+
+def confirm_hold(booking):
+    confirmed = Booking.objects.filter(
+        pk=booking.pk,
+        status=Booking.BookingStatus.PENDING,
+        expires_at__gt=timezone.now()
+    ).update(status=Booking.BookingStatus.CONFIRMED, expires_at=None)
+    if not confirmed:
+        raise HoldExpired("Booking is not an active hold")
+    booking.refresh_from_db()
+    bookings_changed.send(sender=Booking, journey_ids=[booking.journey_id])
+    return booking
+
+
+def _release_bookings(rows, cancelled_time):
+    # rows are (booking_id, journey_id, seat_count) tuples that the caller has
+    # already locked; everything below is set-based regardless of batch size.
+    booking_ids = [booking_id for booking_id, _, _ in rows]
+    seats_per_journey = {}
+    for _, journey_id, seat_count in rows:
+        seats_per_journey[journey_id] = seats_per_journey.get(journey_id, 0) + seat_count
+
+    freed = list(
+        Seat.objects.filter(booking_id__in=booking_ids)
+        .values('journey_id', 'seat_class').annotate(n=Count('id')).order_by()
+        .values_list('journey_id', 'seat_class', 'n')
+    )
+
+    Booking.objects.filter(pk__in=booking_ids).update(
+        status=Booking.BookingStatus.CANCELLED,
+        cancelled_time=cancelled_time,
+        expires_at=None
+    )
+    Seat.objects.filter(booking_id__in=booking_ids).update(is_booked=False, booking=None)
+    if freed:
+        SeatClassAvailability.objects.filter(journey_id__in={journey_id for journey_id, _, _ in freed}).update(
+            available_seats=F('available_seats') + Case(
+                *[When(journey_id=journey_id, seat_class=seat_class, then=Value(count))
+                  for journey_id, seat_class, count in freed],
+                default=Value(0)
+            )
+        )
+    Journey.objects.filter(pk__in=seats_per_journey).update(
+        available_seats=F('available_seats') + Case(
+            *[When(pk=journey_id, then=Value(count)) for journey_id, count in seats_per_journey.items()],
+            default=Value(0)
+        )
+    )
+    invalidate_availability(seats_per_journey)
+    invalidate_seat_map(seats_per_journey)
+    bookings_changed.send(sender=Booking, journey_ids=list(seats_per_journey))
+
+
+def _release_in_batches(queryset, batch_size, skip_locked=False):
+    now = timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update(skip_locked=skip_locked)
+                .values_list('id', 'journey_id', 'seat_count')[:batch_size]
+            )
+            if not rows:
+                break
+            _release_bookings(rows, cancelled_time=now)
+        released += len(rows)
+    return released
+
+
+def release_expired_holds(batch_size=1000):
+    # Walks the (status, expires_at) index, so each batch only touches expired
+    # holds; skip_locked lets several sweepers run side by side.
+    expired = Booking.objects.filter(
+        status=Booking.BookingStatus.PENDING,
+        expires_at__lte=timezone.now()
+    ).order_by('status', 'expires_at')
+    return _release_in_batches(expired, batch_size, skip_locked=True)
+
+
+def cancel_booking(booking):
+    """Cancel one booking; returns False if it was already cancelled."""
+    now = timezone.now()
+    with transaction.atomic():
+        # The row lock serializes concurrent cancels of the same booking; the
+        # loser re-reads the row after the wait and finds nothing to release.
+        rows = list(
+            Booking.objects.select_for_update()
+            .filter(pk=booking.pk)
+            .exclude(status=Booking.BookingStatus.CANCELLED)
+            .values_list('id', 'journey_id', 'seat_count')
+        )
+        if rows:
+            _release_bookings(rows, cancelled_time=now)
+
+    if rows:
+        booking.status = Booking.BookingStatus.CANCELLED
+        booking.cancelled_time = now
+        booking.expires_at = None
+    return bool(rows)
+
+
+def cancel_journey_bookings(journey_id, batch_size=1000):
+    """Cancel a journey and every live booking on it.
+
+    The journey is marked cancelled first, in its own transaction, so no new
+    booking can be made while the existing ones are released in batches.
+    """
+    with transaction.atomic():
+        journey = Journey.objects.select_for_update().get(pk=journey_id)
+        if journey.cancelled_time is None:
+            journey.cancelled_time = timezone.now()
+            journey.save(update_fields=['cancelled_time', 'updated_at'])
+
+    live = Booking.objects.filter(journey_id=journey_id).exclude(
+        status=Booking.BookingStatus.CANCELLED
+    ).order_by('id')
+    return _release_in_batches(live, batch_size)
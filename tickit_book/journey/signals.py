@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from .cache import invalidate_journey, invalidate_stations
+from .models import Journey, Station
+
+# Sent by journey.services after set-based booking updates, which bypass
+# post_save, with the ids of the journeys whose bookings changed.
+bookings_changed = Signal()
+# Sent by journey.importer with the ids of bulk-created journeys.
+journeys_imported = Signal()
+
+
+@receiver(post_save, sender=Journey)
+@receiver(post_delete, sender=Journey)
+def invalidate_journey_cache(sender, instance, **kwargs):
+    invalidate_journey(instance)
+
+
+@receiver(post_save, sender=Station)
+def invalidate_station_cache(sender, instance, created, **kwargs):
+    if created:
+        invalidate_stations()
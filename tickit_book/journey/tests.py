@@ -1,3 +1,538 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from authentication.tokens import tokens_for_user
+from tickit_book import metrics
+from .availability import create_seat_classes
+from .cache import _seat_map_key, _seats_key, search_cache_key
+from .idempotency import _fingerprint
+from .importer import RowError, parse_row
+from .gateways import ChargeResult, FakeGateway
+from .models import Booking, IdempotencyKey, Journey, Payment, Seat, SeatClassAvailability
+from .payments import process_payment
+from .references import BLOCK_SIZE, MASK, ReferenceAllocator, decode, encode
+from .search import search_journeys
+from .seatmap import encode_ranges
+from .services import InsufficientSeats, JourneyCancelled, book_journey, cancel_journey_bookings
 
-# Create your tests here.
+
+def make_user(name='customer'):
+    # No password: hashing is slow and no test logs in with one.
+    return get_user_model().objects.create_user(username=name, email=f'{name}@example.com', password=None)
+
+
+def make_journey(seats=10, **fields):
+    departure = timezone.now() + timedelta(days=1)
+    journey = Journey.objects.create(**{
+        'source': 'Amsterdam',
+        'destination': 'Berlin',
+        'departure_time': departure,
+        'arrival_time': departure + timedelta(hours=6),
+        'transport_name': 'Test',
+        'transport_number': 'T1',
+        'total_seats': seats,
+        'available_seats': seats,
+        'price': 10,
+        **fields,
+    })
+    Seat.objects.bulk_create(journey.build_seats())
+    create_seat_classes([(journey, None)])
+    return journey
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class ConcurrentBookingTests(TransactionTestCase):
+    # Real threads on their own connections and transactions: the row locks
+    # and conditional UPDATEs are what is under test, so nothing is mocked.
+
+    def test_concurrent_bookings_never_oversell(self):
+        seats, attempts = 20, 60
+        journey = make_journey(seats)
+        users = [make_user(f'customer{index}') for index in range(8)]
+
+        def attempt(index):
+            seat_count = 1 + index % 2
+            try:
+                book_journey(users[index % len(users)].pk, journey, seat_count)
+                return seat_count
+            except InsufficientSeats:
+                return 0
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            booked = sum(pool.map(attempt, range(attempts)))
+
+        journey.refresh_from_db()
+        confirmed = Booking.objects.filter(
+            journey=journey, status=Booking.BookingStatus.CONFIRMED
+        ).aggregate(seats=Sum('seat_count'))['seats']
+        self.assertGreater(booked, 0)
+        self.assertGreaterEqual(journey.available_seats, 0)
+        self.assertLessEqual(confirmed, seats)
+        self.assertEqual(confirmed, booked)
+        self.assertEqual(journey.available_seats, seats - booked)
+        self.assertEqual(Seat.objects.filter(journey=journey, is_booked=True).count(), booked)
+        self.assertEqual(
+            SeatClassAvailability.objects.get(journey=journey).available_seats, seats - booked
+        )
+
+
+class BookingListQueryTests(TestCase):
+    # The listing must cost the same number of queries however many bookings
+    # it returns: one for the page and one prefetching the seats. The user
+    # comes from the token's claims, the journey and payment are joined in.
+
+    def setUp(self):
+        self.user = make_user()
+        self.journey = make_journey(seats=30)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}'
+        )
+
+    def book(self, count):
+        for index in range(count):
+            booking = book_journey(self.user.pk, self.journey, 2)
+            if index % 2:
+                Payment.objects.create(
+                    booking=booking,
+                    amount=booking.total_price,
+                    payment_method='Card',
+                    transaction_id=f'txn-{booking.pk}',
+                )
+
+    def assertListQueries(self, bookings):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('booking-list-create'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), bookings)
+
+    def test_one_booking(self):
+        self.book(1)
+        self.assertListQueries(1)
+
+    def test_many_bookings(self):
+        self.book(10)
+        self.assertListQueries(10)
+
+
+class CacheInvalidationTests(TestCase):
+    # Journey A runs Amsterdam-Berlin, B runs Paris-Rome: a write to A must
+    # only drop cache entries that could contain A.
+
+    def setUp(self):
+        cache.clear()
+        self.a = make_journey(seats=5)
+        self.b = make_journey(seats=5, source='Paris', destination='Rome')
+        self.user = make_user()
+        self.client = APIClient()
+        for journey in (self.a, self.b):
+            self.client.get(reverse('journey-seat-map', args=[journey.pk]))
+        self.search('Amsterdam')
+        self.search('Paris')
+
+    def search(self, source):
+        response = self.client.get(reverse('journey-list-create'), {'source': source})
+        return {journey['id']: journey['available_seats'] for journey in response.data['results']}
+
+    def search_key(self, source):
+        return search_cache_key(Request(RequestFactory().get('/', {'source': source})))
+
+    def test_booking_invalidates_only_its_journey(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book_journey(self.user.pk, self.a, 2)
+
+        self.assertIsNone(cache.get(_seats_key(self.a.pk)))
+        self.assertIsNone(cache.get(_seat_map_key(self.a.pk)))
+        self.assertIsNotNone(cache.get(_seats_key(self.b.pk)))
+        self.assertIsNotNone(cache.get(_seat_map_key(self.b.pk)))
+        self.assertEqual(self.search('Amsterdam'), {self.a.pk: 3})
+
+    def test_journey_edit_invalidates_only_searches_that_can_return_it(self):
+        key_a, key_b = self.search_key('Amsterdam'), self.search_key('Paris')
+        self.assertIsNotNone(cache.get(key_a))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a.transport_name = 'Renamed'
+            self.a.save()
+
+        self.assertNotEqual(self.search_key('Amsterdam'), key_a)
+        self.assertEqual(self.search_key('Paris'), key_b)
+        self.assertIsNotNone(cache.get(key_b))
+        self.assertIsNotNone(cache.get(_seat_map_key(self.b.pk)))
+
+    def test_invalidation_waits_for_commit(self):
+        key_a = self.search_key('Amsterdam')
+        with self.captureOnCommitCallbacks() as callbacks:
+            book_journey(self.user.pk, self.a, 2)
+            self.a.save()
+        self.assertIsNotNone(cache.get(_seats_key(self.a.pk)))
+        self.assertIsNotNone(cache.get(_seat_map_key(self.a.pk)))
+        self.assertEqual(self.search_key('Amsterdam'), key_a)
+
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(_seats_key(self.a.pk)))
+        self.assertIsNone(cache.get(_seat_map_key(self.a.pk)))
+        self.assertNotEqual(self.search_key('Amsterdam'), key_a)
+
+
+class SeatMapTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.journey = Journey.objects.create(
+            source='Amsterdam', destination='Berlin', departure_time=timezone.now() + timedelta(days=1),
+            arrival_time=timezone.now() + timedelta(days=1, hours=6), transport_name='Test',
+            transport_number='T1', total_seats=400, available_seats=400, price=10,
+        )
+        Seat.objects.bulk_create(self.journey.build_seats([('Business', 40), ('Economy', 360)]))
+        create_seat_classes([(self.journey, [('Business', 40), ('Economy', 360)])])
+        self.client = APIClient()
+
+    def test_ranges(self):
+        self.assertEqual(encode_ranges(['01', '02', '03', '07', '12A', '12B']),
+                         [['01', 3], ['07', 1], ['12A', 1], ['12B', 1]])
+
+    def test_payload_does_not_list_every_seat(self):
+        book_journey(make_user().pk, self.journey, 2, seat_numbers=['041', '042'])
+        response = self.client.get(reverse('journey-seat-map', args=[self.journey.pk]))
+        economy = response.data['classes']['Economy']
+        self.assertEqual(response.data['classes']['Business']['seat_ranges'], [['001', 40]])
+        self.assertEqual(economy['seat_ranges'], [['041', 360]])
+        self.assertEqual(economy['available'], 358)
+        self.assertTrue(economy['booked'].startswith('wA'))  # 0b11000000
+        self.assertLess(len(response.content), 400)  # under a byte per seat
+
+    def test_unchanged_seat_map_is_not_modified(self):
+        for name in ('journey-seat-map', 'journey-seat-map-async'):
+            with self.subTest(name):
+                cache.clear()
+                url = reverse(name, args=[self.journey.pk])
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    book_journey(make_user(f'{name}-customer').pk, self.journey, 1)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+
+class RequestMetricsTests(TestCase):
+
+    def test_serializer_time_is_recorded_per_view(self):
+        user = make_user()
+        book_journey(user.pk, make_journey(), 2)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+
+        response = client.get(reverse('booking-list-create'))
+
+        self.assertRegex(response['Server-Timing'], r'serializer;dur=[\d.]+, render;dur=')
+        key = ('http_request_serializer_duration_seconds', 'booking-list-create')
+        self.assertGreater(metrics._histograms[key].sum, 0)
+        self.assertLessEqual(
+            metrics._histograms[key].sum,
+            metrics._histograms['http_request_duration_seconds', 'booking-list-create'].sum,
+        )
+
+
+class BookingUpdateTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        self.journey = make_journey(seats=5)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}'
+        )
+
+    def patch(self, booking, data):
+        response = self.client.patch(reverse('booking-detail', args=[booking.pk]), data, format='json')
+        self.assertEqual(response.status_code, 200)
+        booking.refresh_from_db()
+        return booking
+
+    def test_hold_cannot_be_extended_or_confirmed_by_update(self):
+        hold = book_journey(self.user.pk, self.journey, 2, hold=True)
+        expires_at = hold.expires_at
+        hold = self.patch(hold, {
+            'expires_at': '2099-01-01T00:00:00Z', 'status': 'CONFIRMED', 'seat_count': 1, 'notes': 'window',
+        })
+        self.assertEqual(hold.status, Booking.BookingStatus.PENDING)
+        self.assertEqual(hold.expires_at, expires_at)
+        self.assertEqual(hold.seat_count, 2)
+        self.assertEqual(hold.notes, 'window')
+
+    def test_only_delete_cancels_and_releases_the_seats(self):
+        booking = self.patch(book_journey(self.user.pk, self.journey, 2), {'status': 'CANCELLED'})
+        self.assertEqual(booking.status, Booking.BookingStatus.CONFIRMED)
+        self.assertEqual(booking.seats.count(), 2)
+
+        response = self.client.delete(reverse('booking-detail', args=[booking.pk]))
+        self.assertEqual(response.status_code, 204)
+        booking.refresh_from_db()
+        self.journey.refresh_from_db()
+        self.assertEqual(booking.status, Booking.BookingStatus.CANCELLED)
+        self.assertFalse(booking.seats.exists())
+        self.assertEqual(self.journey.available_seats, 5)
+        self.assertEqual(
+            SeatClassAvailability.objects.filter(journey=self.journey).aggregate(free=Sum('available_seats'))['free'], 5
+        )
+
+
+class ImportRowTests(SimpleTestCase):
+    row = {
+        'source': 'Amsterdam',
+        'destination': 'Berlin',
+        'departure_time': '2030-01-01T08:00:00Z',
+        'arrival_time': '2030-01-01T14:00:00Z',
+        'transport_name': 'Test',
+        'transport_number': 'T1',
+        'total_seats': 5,
+        'price': '10.00',
+    }
+
+    def test_valid_row(self):
+        journey, seat_classes = parse_row({**self.row, 'seat_classes': 'A:2,B:3'})
+        self.assertEqual(journey.total_seats, 5)
+        self.assertEqual(seat_classes, [('A', 2), ('B', 3)])
+
+    def test_invalid_rows_raise_row_error(self):
+        for change in (
+            {'source': 123},
+            {'transport_number': ['T1']},
+            {'price': 'NaN'},
+            {'price': 'Infinity'},
+            {'price': '0'},
+            {'price': '-1'},
+            {'price': '123456789012'},
+            {'seat_classes': 'A:-5,B:10'},
+            {'seat_classes': 'A:0,B:5'},
+            {'seat_classes': 'A:2,B:2'},
+            {'seat_classes': ':5'},
+            {'seat_classes': 5},
+        ):
+            with self.subTest(**change), self.assertRaises(RowError):
+                parse_row({**self.row, **change})
+
+
+class BookingReferenceTests(SimpleTestCase):
+
+    def test_encoding_is_unique_and_reversible(self):
+        values = [*range(100_000), *range(MASK - 1000, MASK + 1)]
+        references = {encode(value) for value in values}
+        self.assertEqual(len(references), len(values))
+        for value in values[::97]:
+            self.assertEqual(decode(encode(value)), value)
+
+    def test_check_character_catches_typos(self):
+        reference = encode(12345)
+        for index, char in enumerate(reference):
+            for typo in '0123456789ABCDEFGHJKMNPQRSTVWXYZ':
+                if typo != char:
+                    self.assertIsNone(decode(reference[:index] + typo + reference[index + 1:]))
+
+
+class ReferenceAllocatorTests(TransactionTestCase):
+    # Each thread stands in for a worker process with its own allocator and
+    # connection; between them they cross several block boundaries.
+
+    def test_allocators_never_repeat_a_reference(self):
+        workers, per_worker = 4, BLOCK_SIZE * 2 + 100
+
+        def generate(_):
+            try:
+                allocator = ReferenceAllocator()
+                return [allocator.next_reference() for _ in range(per_worker)]
+            finally:
+                connection.close()
+
+        # SQLite locks the whole database, so there the workers take turns.
+        max_workers = workers if connection.features.has_select_for_update else 1
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            references = [reference for batch in pool.map(generate, range(workers)) for reference in batch]
+        self.assertEqual(len(set(references)), workers * per_worker)
+
+
+class JourneySaveTests(TestCase):
+
+    def test_stations_are_only_resolved_when_a_name_changes(self):
+        journey = Journey.objects.get(pk=make_journey().pk)
+        source_station = journey.source_station_id
+
+        # The update and the analytics stale mark; no station lookups.
+        with self.assertNumQueries(2):
+            journey.save(update_fields=['cancelled_time', 'updated_at'])
+        with self.assertNumQueries(2):
+            journey.save()
+
+        journey.destination = 'Paris'
+        journey.save(update_fields=['destination'])
+        journey.refresh_from_db()
+        self.assertEqual(journey.destination_station.name, 'Paris')
+        self.assertEqual(journey.source_station_id, source_station)
+
+
+class JourneyCancelTests(TestCase):
+
+    def test_cancelled_journey_is_not_bookable_or_listed(self):
+        journey = make_journey(seats=5)
+        booking = book_journey(make_user().pk, journey, 2)
+
+        self.assertEqual(cancel_journey_bookings(journey.pk), 1)
+
+        journey.refresh_from_db()
+        booking.refresh_from_db()
+        self.assertIsNotNone(journey.cancelled_time)
+        self.assertEqual(booking.status, Booking.BookingStatus.CANCELLED)
+        self.assertEqual(journey.available_seats, 5)
+        self.assertFalse(search_journeys(Journey.objects.all(), source='Amsterdam').exists())
+        with self.assertRaises(JourneyCancelled):
+            book_journey(booking.user_id, journey, 1)
+
+
+class IdempotentBookingTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        self.journey = make_journey(seats=10)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}'
+        )
+
+    def post(self, key='retry-1'):
+        return self.client.post(
+            reverse('booking-list-create'),
+            self.data(),
+            format='json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def data(self):
+        return {'journey': self.journey.pk, 'seat_count': 2}
+
+    def claim(self, expires_in):
+        return IdempotencyKey.objects.create(
+            user=self.user,
+            endpoint='booking-list-create',
+            key='retry-1',
+            request_hash=_fingerprint(self.data()),
+            expires_at=timezone.now() + timedelta(seconds=expires_in),
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first, second = self.post(), self.post()
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data['booking_reference'], first.data['booking_reference'])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_live_claim_is_not_taken_over(self):
+        self.claim(expires_in=60)
+        self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(Booking.objects.count(), 0)
+
+    def test_expired_lease_is_reclaimed(self):
+        self.claim(expires_in=-1)
+        response = self.post()
+        self.assertEqual(response.status_code, 201)
+        record = IdempotencyKey.objects.get()
+        self.assertEqual(record.response_status, 201)
+        self.assertEqual(record.response_body['booking_reference'], response.data['booking_reference'])
+
+    def test_failed_request_releases_the_key(self):
+        self.journey.available_seats = 1
+        self.journey.save()
+        self.assertEqual(self.post().status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class CancellingGateway(FakeGateway):
+    """Cancels the booking while the charge is "in flight"."""
+
+    def charge(self, payment):
+        Booking.objects.get(pk=payment.booking_id).cancel()
+        return super().charge(payment)
+
+
+class PaymentProcessingTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        self.booking = book_journey(self.user.pk, make_journey(), 2, hold=True)
+
+    def pay(self, **fields):
+        return Payment.objects.create(
+            booking=self.booking,
+            amount=self.booking.total_price,
+            payment_method='Card',
+            transaction_id=f'txn-{self.booking.pk}',
+            **fields
+        )
+
+    def process(self, payment, gateway=None):
+        with mock.patch('journey.payments.get_gateway', return_value=gateway or FakeGateway()):
+            return process_payment(payment.pk)
+
+    def test_paid_hold_is_confirmed(self):
+        payment = self.process(self.pay())
+        self.booking.refresh_from_db()
+        self.assertEqual(payment.status, Payment.PaymentStatus.COMPLETED)
+        self.assertEqual(self.booking.status, Booking.BookingStatus.CONFIRMED)
+
+    def test_cancelled_booking_is_not_charged(self):
+        payment = self.pay()
+        self.booking.cancel()
+        gateway = mock.Mock()
+        payment = self.process(payment, gateway)
+        self.assertEqual(payment.status, Payment.PaymentStatus.FAILED)
+        gateway.charge.assert_not_called()
+
+    def test_booking_cancelled_mid_charge_is_refunded(self):
+        payment = self.process(self.pay(), CancellingGateway())
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, Booking.BookingStatus.CANCELLED)
+        self.assertEqual(payment.status, Payment.PaymentStatus.REFUNDED)
+        self.assertIn('refund_reference', payment.payment_details)
+
+    def test_failed_refund_is_flagged(self):
+        gateway = CancellingGateway()
+        gateway.refund = lambda payment: ChargeResult(success=False, message='Provider down')
+        with self.assertLogs('journey.payments', 'ERROR'):
+            payment = self.process(self.pay(), gateway)
+        self.assertEqual(payment.status, Payment.PaymentStatus.COMPLETED)
+        self.assertEqual(payment.payment_details['refund_failed'], 'Provider down')
+
+    def test_only_stale_claims_are_taken_over(self):
+        payment = self.pay(status=Payment.PaymentStatus.PROCESSING, claimed_at=timezone.now())
+        self.assertIsNone(self.process(payment))
+
+        Payment.objects.filter(pk=payment.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.process(payment).status, Payment.PaymentStatus.COMPLETED)
+
+    def test_cannot_pay_for_a_cancelled_booking(self):
+        self.booking.cancel()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}')
+        response = client.post(reverse('payment-list-create'), {
+            'booking': self.booking.pk,
+            'amount': str(self.booking.total_price),
+            'payment_method': 'Card',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Payment.objects.exists())
@@ -1,10 +1,17 @@
 from django.urls import path
+from . import async_views
 from .views import (
     JourneyListCreateView,
     JourneyRetrieveUpdateDestroyView,
+    JourneyImportView,
+    JourneyCancelView,
     JourneySeatsListView,
+    JourneySeatMapView,
+    JourneyAvailabilityView,
     BookingListCreateView,
     BookingRetrieveUpdateDestroyView,
+    BookingConfirmView,
+    BookingExportView,
     PaymentListCreateView,
     PaymentRetrieveUpdateView,
     PaymentRefundView
@@ -13,12 +20,23 @@ from .views import (
 urlpatterns = [
     # Journey endpoints
     path('journeys/', JourneyListCreateView.as_view(), name='journey-list-create'),
+    path('journeys/import/', JourneyImportView.as_view(), name='journey-import'),
     path('journeys/<int:pk>/', JourneyRetrieveUpdateDestroyView.as_view(), name='journey-detail'),
+    path('journeys/<int:pk>/cancel/', JourneyCancelView.as_view(), name='journey-cancel'),
     path('journeys/<int:pk>/seats/', JourneySeatsListView.as_view(), name='journey-seats'),
+    path('journeys/<int:pk>/seat-map/', JourneySeatMapView.as_view(), name='journey-seat-map'),
+    path('journeys/<int:pk>/availability/', JourneyAvailabilityView.as_view(), name='journey-availability'),
+    
+    # Async (ASGI) read endpoints
+    path('async/journeys/', async_views.journey_list, name='journey-list-async'),
+    path('async/journeys/<int:pk>/', async_views.journey_detail, name='journey-detail-async'),
+    path('async/journeys/<int:pk>/seat-map/', async_views.journey_seat_map, name='journey-seat-map-async'),
     
     # Booking endpoints
     path('bookings/', BookingListCreateView.as_view(), name='booking-list-create'),
+    path('bookings/export/', BookingExportView.as_view(), name='booking-export'),
     path('bookings/<int:pk>/', BookingRetrieveUpdateDestroyView.as_view(), name='booking-detail'),
+    path('bookings/<int:pk>/confirm/', BookingConfirmView.as_view(), name='booking-confirm'),
     
     # Payment endpoints
     path('payments/', PaymentListCreateView.as_view(), name='payment-list-create'),
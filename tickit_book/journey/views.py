@@ -1,8 +1,17 @@
+import io
+import uuid
 from rest_framework import generics, permissions, status
+from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import router
+from django.http import StreamingHttpResponse
+from django.core.cache import cache
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from .models import Journey, Booking, Payment, Seat
+from django.utils.http import parse_etags
+from tickit_book.bulk_import import read_rows
+from .models import Journey, Booking, Payment
 from .serializers import (
     JourneySerializer,
     BookingSerializer,
@@ -11,48 +20,133 @@ from .serializers import (
     CreateBookingSerializer,
     CreatePaymentSerializer
 )
+from .availability import seat_class_availability
+from .cache import search_cache_key, overlay_availability, get_seat_map
+from .export import DATE_FIELDS, FORMATS, RENDERERS, export_rows, parse_bound
+from .idempotency import IdempotentCreateMixin
+from .importer import import_journeys
+from .optimizer import optimize_queryset
+from .payments import enqueue_payment
+from .pagination import JourneyPagination, BookingPagination, PaymentPagination, SeatPagination
+from .search import search_journeys
+from .seatmap import build_seat_map
+from .services import (
+    book_journey,
+    confirm_hold,
+    cancel_journey_bookings,
+    InsufficientSeats,
+    SeatUnavailable,
+    HoldExpired,
+    JourneyCancelled
+)
 
 class JourneyListCreateView(generics.ListCreateAPIView):
     serializer_class = JourneySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = JourneyPagination
     
     def get_queryset(self):
-        queryset = Journey.objects.all()
-        source = self.request.query_params.get('source')
-        destination = self.request.query_params.get('destination')
-        
-        if source:
-            queryset = queryset.filter(source__icontains=source)
-        if destination:
-            queryset = queryset.filter(destination__icontains=destination)
+        queryset = search_journeys(
+            Journey.objects.all(),
+            source=self.request.query_params.get('source'),
+            destination=self.request.query_params.get('destination')
+        )
         
         upcoming_only = self.request.query_params.get('upcoming', 'true').lower() == 'true'
         if upcoming_only:
             queryset = queryset.filter(departure_time__gte=timezone.now())
         
         return queryset
+    
+    def list(self, request, *args, **kwargs):
+        key = search_cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, settings.JOURNEY_SEARCH_CACHE_TIMEOUT)
+        
+        # Seat counts change far more often than timetables, so they are
+        # overlaid from per-journey counters instead of invalidating the page.
+        return Response({**data, 'results': overlay_availability(data['results'])})
+
+class JourneyImportView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'A file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        format = request.data.get('format') or ('jsonl' if upload.name.endswith(('.jsonl', '.json')) else 'csv')
+        if format not in ('csv', 'jsonl'):
+            return Response({'detail': 'Format must be csv or jsonl'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        report = list(import_journeys(read_rows(stream, format)))
+        
+        return Response({
+            'created': sum(batch['created'] for batch in report),
+            'batches': report
+        }, status=status.HTTP_201_CREATED)
 
 class JourneyRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Journey.objects.all()
     serializer_class = JourneySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+class JourneyCancelView(generics.UpdateAPIView):
+    queryset = Journey.objects.all()
+    serializer_class = JourneySerializer
+    permission_classes = [permissions.IsAdminUser]
+    http_method_names = ['patch']
+    
+    def patch(self, request, *args, **kwargs):
+        journey = self.get_object()
+        cancelled = cancel_journey_bookings(journey.pk)
+        
+        return Response(
+            {'cancelled_bookings': cancelled},
+            status=status.HTTP_200_OK
+        )
+
 class JourneySeatsListView(generics.ListAPIView):
     serializer_class = SeatSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = SeatPagination
     
     def get_queryset(self):
         journey = get_object_or_404(Journey, pk=self.kwargs['pk'])
         return journey.seats.all()
 
-class BookingListCreateView(generics.ListCreateAPIView):
+class JourneySeatMapView(APIView):
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, pk):
+        etag, payload = get_seat_map(pk, build_seat_map)
+        
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
+        return Response(payload, headers={'ETag': etag})
+
+class JourneyAvailabilityView(APIView):
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, pk):
+        seat_classes = seat_class_availability(pk)
+        if not seat_classes:
+            get_object_or_404(Journey, pk=pk)
+        return Response(seat_classes)
+
+class BookingListCreateView(IdempotentCreateMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = BookingPagination
     
     def get_serializer_class(self):
         return CreateBookingSerializer if self.request.method == 'POST' else BookingSerializer
     
     def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user)
+        return optimize_queryset(Booking.objects.filter(user_id=self.request.user.id), BookingSerializer)
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -62,32 +156,31 @@ class BookingListCreateView(generics.ListCreateAPIView):
         seat_count = serializer.validated_data['seat_count']
         seat_numbers = serializer.validated_data.get('seat_numbers', [])
         
-        if journey.available_seats < seat_count:
+        try:
+            booking = book_journey(
+                user_id=request.user.id,
+                journey=journey,
+                seat_count=seat_count,
+                seat_numbers=seat_numbers,
+                seat_class=serializer.validated_data.get('seat_class'),
+                notes=serializer.validated_data.get('notes', ''),
+                hold=serializer.validated_data.get('hold', False)
+            )
+        except InsufficientSeats:
             return Response(
                 {'error': 'Not enough seats available'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        booking = Booking.objects.create(
-            user=request.user,
-            journey=journey,
-            seat_count=seat_count,
-            total_price=journey.price * seat_count,
-            notes=serializer.validated_data.get('notes', '')
-        )
-        
-        if seat_numbers:
-            seats = Seat.objects.filter(
-                journey=journey,
-                seat_number__in=seat_numbers
+        except SeatUnavailable:
+            return Response(
+                {'error': 'One or more selected seats are already booked'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except JourneyCancelled:
+            return Response(
+                {'error': 'This journey has been cancelled'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            for seat in seats:
-                seat.is_booked = True
-                seat.booking = booking
-                seat.save()
-        
-        journey.available_seats -= seat_count
-        journey.save()
         
         return Response(
             BookingSerializer(booking).data,
@@ -99,21 +192,74 @@ class BookingRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user)
+        return optimize_queryset(Booking.objects.filter(user_id=self.request.user.id), BookingSerializer)
     
     def perform_destroy(self, instance):
         instance.cancel()
 
-class PaymentListCreateView(generics.ListCreateAPIView):
+class BookingConfirmView(generics.UpdateAPIView):
+    serializer_class = BookingSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ['patch']
+    
+    def get_queryset(self):
+        return Booking.objects.filter(user_id=self.request.user.id)
+    
+    def patch(self, request, *args, **kwargs):
+        booking = self.get_object()
+        
+        try:
+            booking = confirm_hold(booking)
+        except HoldExpired:
+            return Response(
+                {'detail': 'Only active holds can be confirmed'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(
+            BookingSerializer(booking).data,
+            status=status.HTTP_200_OK
+        )
+
+class BookingExportView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        # Not ?format=, which DRF reserves for picking a renderer.
+        format = request.query_params.get('file_format', 'csv')
+        date_field = request.query_params.get('date_field', 'booking_time')
+        if format not in FORMATS:
+            return Response({'detail': 'Format must be csv or jsonl'}, status=status.HTTP_400_BAD_REQUEST)
+        if date_field not in DATE_FIELDS:
+            return Response(
+                {'detail': f"date_field must be one of {', '.join(DATE_FIELDS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            start = parse_bound(request.query_params.get('start'))
+            end = parse_bound(request.query_params.get('end'), end=True)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Bound now: the stream is consumed after the replica middleware
+        # has returned.
+        rows = export_rows(start, end, date_field=date_field, using=router.db_for_read(Booking))
+        response = StreamingHttpResponse(RENDERERS[format](rows), content_type=FORMATS[format])
+        response['Content-Disposition'] = f'attachment; filename="bookings.{format}"'
+        return response
+
+class PaymentListCreateView(IdempotentCreateMixin, generics.ListCreateAPIView):
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PaymentPagination
     
     def get_queryset(self):
-        return Payment.objects.filter(booking__user=self.request.user)
+        return Payment.objects.filter(booking__user_id=self.request.user.id)
     
     def create(self, request, *args, **kwargs):
         booking_id = request.data.get('booking')
-        booking = get_object_or_404(Booking, pk=booking_id, user=request.user)
+        booking = get_object_or_404(Booking, pk=booking_id, user_id=request.user.id)
         
         if hasattr(booking, 'payment'):
             return Response(
@@ -121,12 +267,19 @@ class PaymentListCreateView(generics.ListCreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if not booking.is_payable():
+            return Response(
+                {'detail': 'This booking has been cancelled or its hold has expired'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         serializer = CreatePaymentSerializer(
             data=request.data,
             context={'booking': booking}
         )
         serializer.is_valid(raise_exception=True)
-        payment = serializer.save(booking=booking)
+        payment = serializer.save(booking=booking, transaction_id=uuid.uuid4().hex)
+        enqueue_payment(payment.pk)
         
         return Response(
             PaymentSerializer(payment).data,
@@ -138,7 +291,7 @@ class PaymentRetrieveUpdateView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Payment.objects.filter(booking__user=self.request.user)
+        return Payment.objects.filter(booking__user_id=self.request.user.id)
 
 class PaymentRefundView(generics.UpdateAPIView):
     serializer_class = PaymentSerializer
@@ -146,7 +299,7 @@ class PaymentRefundView(generics.UpdateAPIView):
     http_method_names = ['patch']
     
     def get_queryset(self):
-        return Payment.objects.filter(booking__user=self.request.user)
+        return Payment.objects.filter(booking__user_id=self.request.user.id)
     
     def patch(self, request, *args, **kwargs):
         payment = self.get_object()
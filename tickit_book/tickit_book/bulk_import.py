@@ -0,0 +1,121 @@
+"""
+Batch importing from CSV or JSON-lines files.
+
+read_rows() turns a file into (line_number, row) pairs and import_rows()
+feeds them through an app's parse and insert functions one batch at a
+time. ImportCommand is the management command around the two; the
+journey and user importers only supply what differs.
+"""
+
+import csv
+import json
+from itertools import islice
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+
+
+class RowError(Exception):
+    pass
+
+
+def read_rows(stream, format):
+    """Yield (line_number, dict) pairs from a CSV or JSON-lines text stream."""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                row = exc
+            yield line_number, row
+    else:
+        raise ValueError(f"Unsupported format: {format}")
+
+
+def import_rows(rows, parse_row, insert_batch, batch_size=1000):
+    """Validate and insert rows batch by batch, yielding one report per batch.
+
+    parse_row() turns a raw row into an object or raises RowError.
+    insert_batch() gets the batch's (line_number, object) pairs and returns
+    how many it created along with error reports for any it skipped.
+
+    Only one batch is held in memory at a time. Invalid rows are reported
+    and skipped; a batch that fails to insert is rolled back as a whole.
+    """
+    rows = iter(rows)
+    batch_number = 0
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return
+        batch_number += 1
+
+        parsed, errors = [], []
+        for line_number, row in chunk:
+            try:
+                parsed.append((line_number, parse_row(row)))
+            except RowError as exc:
+                errors.append({'line': line_number, 'error': str(exc)})
+
+        created = 0
+        if parsed:
+            try:
+                created, skipped = insert_batch(parsed)
+                errors.extend(skipped)
+            except DatabaseError as exc:
+                errors.append({'line': None, 'error': f"batch rolled back: {exc}"})
+
+        yield {
+            'batch': batch_number,
+            'first_line': chunk[0][0],
+            'rows': len(chunk),
+            'created': created,
+            'errors': sorted(errors, key=lambda error: error['line'] or 0),
+        }
+
+
+class ImportCommand(BaseCommand):
+    """Import a file with run_import(), reporting on each batch."""
+
+    noun = 'rows'
+
+    def run_import(self, rows, batch_size):
+        raise NotImplementedError
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--report', help="Write the per-batch report as JSON lines to this file")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        report = open(options['report'], 'w') if options['report'] else None
+        created = failed = 0
+
+        try:
+            with open(path, newline='', encoding='utf-8') as stream:
+                for batch in self.run_import(read_rows(stream, format), options['batch_size']):
+                    created += batch['created']
+                    failed += len(batch['errors'])
+                    if report:
+                        report.write(json.dumps(batch) + '\n')
+                    if batch['errors']:
+                        self.stderr.write(
+                            f"Batch {batch['batch']} (line {batch['first_line']}): "
+                            f"{len(batch['errors'])} errors, first: {batch['errors'][0]}"
+                        )
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"Batch {batch['batch']}: {batch['created']}/{batch['rows']} created")
+        finally:
+            if report:
+                report.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {created} {self.noun}, {failed} errors"))
@@ -0,0 +1,27 @@
+"""
+Per-process state that must not survive a fork.
+
+Pre-fork servers (gunicorn --preload, multiprocessing pools) import modules
+once in the parent and fork the workers from it. Anything a module keeps
+for its own process, such as a thread pool or a reserved block of booking
+references, has to be dropped in the child; modules register a reset here
+instead of each installing their own fork hook.
+"""
+
+import os
+
+_resets = []
+
+
+def reset_after_fork(reset):
+    """Call reset() in every child forked from now on; usable as a decorator."""
+    _resets.append(reset)
+    return reset
+
+
+def _after_fork_in_child():
+    for reset in _resets:
+        reset()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,244 @@
+"""
+Per-view request metrics.
+
+metrics_middleware records, for every request, wall time, the number and
+total time of database queries, serializer time, time spent rendering the
+response and the response size. Each figure goes into an in-process
+histogram labelled with the view's URL name, exposed in the Prometheus text
+format by metrics_view, and the timings are also returned in a
+Server-Timing header.
+
+Serializer time is the time spent in to_representation() of serializers
+that include TimedSerializerMixin, i.e. building serializer.data; nested
+serializers count once, as part of their parent. Queries run lazily while
+serializing count towards both serializer and database time. Rendering is
+timed separately by TimedJSONRenderer, DRF's default renderer here, and
+only covers encoding the finished data.
+
+metrics_view requires METRICS_TOKEN when it is set; without one it only
+answers while DEBUG is on (production settings refuse to start without a
+token).
+
+Histograms are per process: scrape each worker (or run one per container)
+rather than a load-balanced address.
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.renderers import JSONRenderer
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = {
+    # name: (help, buckets)
+    'http_request_duration_seconds': ("Wall time per request", TIME_BUCKETS),
+    'http_request_db_queries': ("Database queries per request", COUNT_BUCKETS),
+    'http_request_db_duration_seconds': ("Database time per request", TIME_BUCKETS),
+    'http_request_serializer_duration_seconds': ("Serializer to_representation time per request", TIME_BUCKETS),
+    'http_request_render_duration_seconds': ("Response rendering time per request", TIME_BUCKETS),
+    'http_response_size_bytes': ("Response body size", SIZE_BUCKETS),
+}
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+_histograms = {}  # (metric, view) -> Histogram
+_lock = threading.Lock()
+
+
+def observe(view, values):
+    with _lock:
+        for metric, value in values.items():
+            histogram = _histograms.get((metric, view))
+            if histogram is None:
+                histogram = _histograms[metric, view] = Histogram(METRICS[metric][1])
+            histogram.observe(value)
+
+
+def render_metrics():
+    with _lock:
+        snapshot = {
+            key: (list(histogram.counts), histogram.sum, histogram.count)
+            for key, histogram in _histograms.items()
+        }
+
+    lines = []
+    for metric, (help, buckets) in METRICS.items():
+        lines.append(f'# HELP {metric} {help}')
+        lines.append(f'# TYPE {metric} histogram')
+        for (name, view), (counts, total, count) in sorted(snapshot.items()):
+            if name != metric:
+                continue
+            label = view.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{view="{label}"}} {total}')
+            lines.append(f'{metric}_count{{view="{label}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+class _RequestStats:
+    __slots__ = ('queries', 'db_time', 'serializer_time', 'serializer_depth', 'render_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.render_time = 0.0
+
+
+# The stats object is shared, not copied, when the context is copied into
+# sync_to_async threads, so queries run there are still counted.
+_current = ContextVar('request_stats', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+
+
+def _install_query_wrapper(sender, connection, **kwargs):
+    # Connections are reopened on the same wrapper object, so guard against
+    # stacking the wrapper up.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class TimedSerializerMixin:
+    """Count to_representation() towards the request's serializer time."""
+
+    def to_representation(self, instance):
+        stats = _current.get()
+        if stats is None or stats.serializer_depth:
+            return super().to_representation(instance)
+        stats.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serializer_time += time.perf_counter() - started
+            stats.serializer_depth -= 1
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            stats.render_time += time.perf_counter() - started
+
+
+_installed = False
+
+
+def _install():
+    global _installed
+    if _installed:
+        return
+    connection_created.connect(_install_query_wrapper, dispatch_uid='metrics_query_wrapper')
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None:
+            _install_query_wrapper(None, connection)
+    _installed = True
+
+
+def _finish(request, response, stats, started):
+    elapsed = time.perf_counter() - started
+    match = getattr(request, 'resolver_match', None)
+    view = (match.url_name or match.view_name) if match else 'unresolved'
+
+    values = {
+        'http_request_duration_seconds': elapsed,
+        'http_request_db_queries': stats.queries,
+        'http_request_db_duration_seconds': stats.db_time,
+        'http_request_serializer_duration_seconds': stats.serializer_time,
+        'http_request_render_duration_seconds': stats.render_time,
+    }
+    if not response.streaming:
+        values['http_response_size_bytes'] = len(response.content)
+    observe(view, values)
+
+    if settings.METRICS_SERVER_TIMING:
+        response['Server-Timing'] = (
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+            f'serializer;dur={stats.serializer_time * 1000:.1f}, '
+            f'render;dur={stats.render_time * 1000:.1f}, '
+            f'total;dur={elapsed * 1000:.1f}'
+        )
+    return response
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    _install()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats = _RequestStats()
+            token = _current.set(stats)
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            return _finish(request, response, stats, started)
+    else:
+        def middleware(request):
+            stats = _RequestStats()
+            token = _current.set(stats)
+            started = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            return _finish(request, response, stats, started)
+    return middleware
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not constant_time_compare(supplied, token):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
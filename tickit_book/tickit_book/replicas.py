@@ -0,0 +1,120 @@
+"""
+Read-replica routing.
+
+replica_middleware picks one replica from settings.DATABASE_REPLICAS for each
+GET/HEAD/OPTIONS request and ReplicaRouter sends that request's reads to it.
+Everything else reads and writes the primary: unsafe requests, management
+commands, background workers and any read inside a transaction.
+
+After a successful write the client's reads stay on the primary for
+REPLICA_STICKY_SECONDS, so it sees its own bookings and payments before the
+replicas have caught up. API clients authenticate with a bearer token and
+rarely keep cookies, so an authenticated writer is also pinned by user id
+in the shared cache; the short-lived cookie covers browser sessions and
+anonymous clients. Without replicas nothing is pinned.
+"""
+
+import random
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+_token_authentication = JWTStatelessUserAuthentication()
+
+
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def _token_user_id(request):
+    # This runs before DRF authenticates the request, so the bearer token is
+    # checked here as well. A valid signature is all that matters: the id
+    # only decides which database serves the reads.
+    try:
+        authenticated = _token_authentication.authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return authenticated[0].id if authenticated else None
+
+
+def _is_pinned(request):
+    if settings.REPLICA_STICKY_COOKIE in request.COOKIES:
+        return True
+    user_id = _token_user_id(request)
+    return user_id is not None and cache.get(_pin_key(user_id)) is not None
+
+
+def _choose_alias(request):
+    if settings.DATABASE_REPLICAS and request.method in SAFE_METHODS and not _is_pinned(request):
+        return random.choice(settings.DATABASE_REPLICAS)
+    return None
+
+
+def _pin_after_write(request, response):
+    if not settings.DATABASE_REPLICAS or request.method in SAFE_METHODS or response.status_code >= 400:
+        return response
+    # DRF replaces request.user with the token's user once it authenticates.
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        cache.set(_pin_key(user.id), 1, settings.REPLICA_STICKY_SECONDS)
+    response.set_cookie(
+        settings.REPLICA_STICKY_COOKIE, '1',
+        max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax'
+    )
+    return response
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    # The alias lives in a ContextVar so it follows the request into
+    # sync_to_async threads under ASGI. Streaming responses are rendered
+    # after it is reset; views that stream should bind their queryset with
+    # .using(router.db_for_read(...)) first.
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _read_alias.set(_choose_alias(request))
+            try:
+                response = await get_response(request)
+            finally:
+                _read_alias.reset(token)
+            if request.method in SAFE_METHODS:
+                return response
+            # A session user may still be a lazy object that loads from the database.
+            return await sync_to_async(_pin_after_write)(request, response)
+    else:
+        def middleware(request):
+            token = _read_alias.set(_choose_alias(request))
+            try:
+                response = get_response(request)
+            finally:
+                _read_alias.reset(token)
+            return _pin_after_write(request, response)
+    return middleware
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,15 +38,20 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     "corsheaders",
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'authentication',
-    'journey'
+    'journey',
+    'analytics'
 ]
 
 MIDDLEWARE = [
+    'tickit_book.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
+    'tickit_book.replicas.replica_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.common.CommonMiddleware',
@@ -89,6 +95,19 @@ DATABASES = {
     }
 }
 
+# Read replicas are further DATABASES entries listed in DATABASE_REPLICAS,
+# e.g. DATABASES['replica'] = {**DATABASES['default'], 'HOST': 'replica',
+# 'TEST': {'MIRROR': 'default'}}. GET requests read from one of them unless
+# the client (by user id, or cookie without a token) wrote within the last
+# REPLICA_STICKY_SECONDS.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['tickit_book.replicas.ReplicaRouter']
+REPLICA_STICKY_COOKIE = 'pin_primary'
+REPLICA_STICKY_SECONDS = 10
+
+
+AUTH_USER_MODEL = 'authentication.UserProfile'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -109,6 +128,38 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+#
+# Argon2 when argon2-cffi is installed, PBKDF2 otherwise; either way the
+# cost is tunable here and stored hashes are upgraded on the next login.
+# Benchmark a setting's CPU cost per login with `manage.py bench_login`.
+
+PASSWORD_ARGON2 = {
+    'TIME_COST': 2,
+    'MEMORY_COST': 64 * 1024,  # KiB
+    'PARALLELISM': 1,
+}
+PASSWORD_PBKDF2_ITERATIONS = 1_000_000
+
+PASSWORD_HASHERS = [
+    'authentication.hashers.TunedArgon2PasswordHasher',
+    'authentication.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if importlib.util.find_spec('argon2') is None:
+    PASSWORD_HASHERS.remove('authentication.hashers.TunedArgon2PasswordHasher')
+
+# Token buckets for the endpoints that hash passwords, as
+# (bucket size, tokens added per minute). Rejected attempts never hash.
+LOGIN_THROTTLES = {
+    'login_ip': (20, 10),
+    'login_account': (5, 2),
+    'password_change': (5, 1),
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -134,13 +185,82 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     # Use Django's standard `django.contrib.auth` permissions,
     # or allow read-only access for unauthenticated users.
+    'DEFAULT_RENDERER_CLASSES': (
+        'tickit_book.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.tokens.StatelessJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
-    ]
+    ],
+    # Throttles identify clients by REMOTE_ADDR. X-Forwarded-For is set by
+    # the client unless a proxy we run overwrites it, so it is only read
+    # when NUM_PROXIES says how many of its entries our proxies appended.
+    'NUM_PROXIES': 0,
+}
+
+# request.user is built from the access token's claims; issue tokens with
+# authentication.tokens.tokens_for_user() so they carry them. The API keeps
+# no sessions: logout blacklists the refresh token, and blacklisted rows are
+# pruned once expired by running `manage.py flushexpiredtokens` daily.
+SIMPLE_JWT = {
+    'TOKEN_USER_CLASS': 'authentication.tokens.ClaimsUser',
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.tokens.RevocableTokenRefreshSerializer',
+}
+
+# Full profiles loaded through request.user.profile are kept per process
+AUTH_PROFILE_CACHE_SIZE = 1024  # profiles; 0 disables the cache
+AUTH_PROFILE_CACHE_TTL = 60  # seconds
+
+# Profiles looked up by username are cached in the shared cache
+PROFILE_CACHE_TIMEOUT = 5 * 60  # seconds
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+# Journey search pages are invalidated on writes; the TTL bounds how long a
+# page can keep listing a journey that has since departed.
+JOURNEY_SEARCH_CACHE_TIMEOUT = 60  # seconds
+
+# Seat maps are invalidated whenever seats are claimed or released
+SEAT_MAP_CACHE_TIMEOUT = 300  # seconds
+
+# How long a PENDING booking holds its seats before the sweeper releases them
+BOOKING_HOLD_TTL = 15 * 60  # seconds
+
+# Payments are charged off the request path by a per-process thread pool
+PAYMENT_GATEWAY = {
+    'BACKEND': 'journey.gateways.FakeGateway',
+    'OPTIONS': {
+        'latency': 0.5,  # seconds
+        'failure_rate': 0.0,
+    },
 }
+PAYMENT_WORKERS = 4
+# A PROCESSING payment claimed longer ago than this is retried by process_payments
+PAYMENT_CLAIM_TIMEOUT = 5 * 60  # seconds
+
+# How long a stored Idempotency-Key response is replayed to retries
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60  # seconds
+
+# How long an in-flight Idempotency-Key claim lasts before another request
+# may take it over; only reached when the worker holding it has died
+IDEMPOTENCY_LEASE = 60  # seconds
+
+# Per-view histograms are served at /metrics; set METRICS_TOKEN to require
+# "Authorization: Bearer <token>" from the scraper. Without a token they are
+# only served while DEBUG is on.
+METRICS_TOKEN = None
+METRICS_SERVER_TIMING = True
 
 CORS_ALLOWED_ORIGINS = [
     "https://example.com",
@@ -0,0 +1,117 @@
+"""
+Production settings for tickit_book.
+
+Select with DJANGO_SETTINGS_MODULE=tickit_book.settings_production. Anything
+that differs between environments is read from the environment:
+
+    DJANGO_SECRET_KEY, DJANGO_ALLOWED_HOSTS (comma separated)
+    DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+    DB_REPLICA_HOSTS       comma separated; same credentials as the primary
+    DB_POOL                "true" to use Django's psycopg connection pool
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT
+    DB_CONN_MAX_AGE        seconds to keep a connection without the pool
+    DB_DISABLE_SERVER_SIDE_CURSORS
+                           "true" behind PgBouncer in transaction mode
+    CACHE_URL              redis://... or pymemcache://host:port; must be set
+    NUM_PROXIES            reverse proxies in front of the app that append to
+                           X-Forwarded-For; 0 (the default) trusts REMOTE_ADDR
+    METRICS_TOKEN          bearer token required to scrape /metrics; must be set
+"""
+
+import os
+from django.core.exceptions import ImproperlyConfigured
+from .settings import *  # noqa: F401,F403
+
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def env_list(name, default=''):
+    return [item.strip() for item in os.environ.get(name, default).split(',') if item.strip()]
+
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+DEBUG = False
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+if not METRICS_TOKEN:
+    raise ImproperlyConfigured("METRICS_TOKEN must be set to scrape /metrics in production")
+REST_FRAMEWORK = {**REST_FRAMEWORK, 'NUM_PROXIES': env_int('NUM_PROXIES', 0)}
+
+
+# Database
+#
+# Opening a PostgreSQL connection (TCP, TLS, authentication, backend fork)
+# costs more than most of our queries, so connections are reused: either
+# from a per-process psycopg pool, or by keeping each thread's connection
+# for DB_CONN_MAX_AGE seconds. Both check a connection before reusing it,
+# so a database restart costs one retry rather than a burst of errors.
+
+def _database(host):
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'tickit'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': host,
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'DISABLE_SERVER_SIDE_CURSORS': env_bool('DB_DISABLE_SERVER_SIDE_CURSORS'),
+        'OPTIONS': {},
+    }
+    if env_bool('DB_POOL'):
+        from psycopg_pool import ConnectionPool
+
+        # The pool is per process: size it as (max connections the server
+        # allows us) / (gunicorn workers), not per thread.
+        database['CONN_MAX_AGE'] = 0  # Django refuses persistent connections with a pool
+        database['OPTIONS']['pool'] = {
+            'min_size': env_int('DB_POOL_MIN_SIZE', 2),
+            'max_size': env_int('DB_POOL_MAX_SIZE', 10),
+            'timeout': env_int('DB_POOL_TIMEOUT', 10),
+            'check': ConnectionPool.check_connection,
+        }
+    else:
+        database['CONN_MAX_AGE'] = env_int('DB_CONN_MAX_AGE', 600)
+        database['CONN_HEALTH_CHECKS'] = True
+    return database
+
+
+DATABASES = {'default': _database(os.environ.get('DB_HOST', 'localhost'))}
+for index, host in enumerate(env_list('DB_REPLICA_HOSTS'), start=1):
+    DATABASES[f'replica{index}'] = {**_database(host), 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+
+# Cache
+#
+# Throttles, token revocation, replica read pins and the search and
+# seat-map generation stamps only work if every process sees the same
+# cache, so production refuses to start with the base settings' per-process
+# locmem cache.
+
+CACHE_URL = os.environ.get('CACHE_URL')
+if not CACHE_URL:
+    raise ImproperlyConfigured("CACHE_URL must point at a cache shared by every worker in production")
+if CACHE_URL.startswith(('redis://', 'rediss://', 'unix://')):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+        'TIMEOUT': 300,
+    }}
+elif CACHE_URL.startswith('pymemcache://'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': CACHE_URL.removeprefix('pymemcache://'),
+        'TIMEOUT': 300,
+    }}
+else:
+    raise ImproperlyConfigured(f"Unsupported CACHE_URL scheme: {CACHE_URL}")